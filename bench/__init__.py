@@ -0,0 +1,11 @@
+"""
+Benchmarks for the fetch, parse and decode paths. Not imported by the app;
+run from the repository root:
+
+    python -m bench.fetch         fetch wall-clock time as the mailbox grows
+    python -m bench.parse_pool    MIME parsing inline vs worker processes
+    python -m bench.html_text     html_to_text vs the old regex cascade
+    python -m bench.charset       decode throughput and correctness per charset
+
+Shared synthetic mail and the local IMAP stand-in live in bench/corpus.py.
+"""
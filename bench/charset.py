@@ -0,0 +1,102 @@
+"""
+Per-charset decode throughput and a multilingual correctness check for
+decode_text, against the trial-decode cascade it replaced. Exits non-zero
+if any sample decodes wrongly.
+
+    python -m bench.charset
+"""
+from __future__ import annotations
+import argparse
+import sys
+import timeit
+
+from utils.charset import decode_text
+
+
+def _cascade_decode(raw: bytes) -> str:
+    """The trial-decode cascade decode_text() replaced."""
+    for enc in ("utf-8", "latin-1", "ascii", "windows-1252"):
+        try:
+            return raw.decode(enc)
+        except Exception:
+            continue
+    return raw.decode("utf-8", errors="replace")
+
+
+# (declared label, text) — each encoded with the label's own Python codec
+_SAMPLES = [
+    ("us-ascii",     "Hi team,\nThe quarterly report is attached. Thanks!"),
+    ("utf-8",        "Grüße aus München — das Meeting ist um 14:00 Uhr. 👍"),
+    ("iso-8859-1",   "Réunion à 15h, café et croissants offerts. À bientôt!"),
+    ("windows-1252", "Don’t forget the “launch” on Friday – €20 entry…"),
+    ("iso-8859-2",   "Zażółć gęślą jaźń. Dzień dobry, Łódź!"),
+    ("iso-8859-15",  "Prix : 30 € - œuvre d'art"),
+    ("koi8-r",       "Привет! Встреча перенесена на завтра."),
+    ("windows-1251", "Здравствуйте, счёт во вложении."),
+    ("iso-8859-7",   "Καλημέρα, η συνάντηση είναι αύριο."),
+    ("iso-8859-8",   "שלום, הפגישה מחר בשעה עשר."),
+    ("windows-1256", "مرحبا، الاجتماع غدا في العاشرة."),
+    ("iso-8859-9",   "Toplantı yarın saat onda, görüşmek üzere."),
+    ("tis-620",      "สวัสดีครับ ประชุมพรุ่งนี้"),
+    ("shift_jis",    "お世話になっております。会議は明日です。"),
+    ("euc-jp",       "ご確認のほどよろしくお願いいたします。"),
+    ("iso-2022-jp",  "添付資料をご確認ください。"),
+    ("gb2312",       "您好，会议改到明天上午十点。"),
+    ("big5",         "您好，會議改到明天上午十點。"),
+    ("euc-kr",       "안녕하세요, 회의는 내일입니다."),
+    ("ks_c_5601-1987", "첨부 파일을 확인해 주세요."),
+    ("utf-16-le",    "Hi team, see you at 10."),
+    ("utf-16",       "Hello — Привет"),
+    ("utf-32-be",    "Hi"),
+]
+
+# (declared label, actual encoding, text): labels that lie or are missing
+_MISLABELLED = [
+    ("iso-8859-1", "utf-8",  "Grüße — naïve café"),
+    ("us-ascii",   "utf-8",  "Zażółć gęślą jaźń"),
+    (None,         "utf-8",  "Привет, мир"),
+    (None,         "cp1252", "Don’t “quote” me"),
+    ("x-unknown",  "cp1252", "Café crème"),
+    ("utf-8",      "cp1252", "Café"),   # stray byte: replaced, rest kept
+]
+
+
+def _check() -> int:
+    failures = 0
+    for label, text in _SAMPLES:
+        got = decode_text(text.encode(label), label)
+        if got != text:
+            failures += 1
+            print(f"FAIL  {label:<16} {got!r}")
+    for label, actual, text in _MISLABELLED:
+        got = decode_text(text.encode(actual), label)
+        ok = got == text or (label == "utf-8" and got == "Caf�")
+        if not ok:
+            failures += 1
+            print(f"FAIL  {str(label):<16} ({actual}) {got!r}")
+    cascade_ok = sum(_cascade_decode(t.encode(lbl)) == t for lbl, t in _SAMPLES)
+    print(f"correct: {len(_SAMPLES) + len(_MISLABELLED) - failures}/{len(_SAMPLES) + len(_MISLABELLED)} "
+          f"(old cascade: {cascade_ok}/{len(_SAMPLES)} declared samples)")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-charset decode throughput and correctness.")
+    parser.add_argument("--size", type=int, default=64 * 1024, help="approximate body size in bytes")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    failures = _check()
+    print(f"\n{'charset':<16}{'cascade':>12}{'':<9}{'decode_text':>12}")
+    for label, text in _SAMPLES:
+        raw = (text * max(1, args.size // len(text.encode(label)))).encode(label)
+        number = max(1, 20_000_000 // len(raw))
+        old = min(timeit.repeat(lambda: _cascade_decode(raw), number=number, repeat=args.repeat)) / number
+        new = min(timeit.repeat(lambda: decode_text(raw, label), number=number, repeat=args.repeat)) / number
+        old_ok = "ok" if _cascade_decode(raw) == raw.decode(label) else "garbled"
+        print(f"{label:<16}{len(raw) / old / 1e6:>8.0f}MB/s {old_ok:<8}{len(raw) / new / 1e6:>8.0f}MB/s")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Synthetic mail shared by the benchmarks.
+
+Plain-text stand-in messages, table-layout HTML newsletters, imaplib-shaped
+UID FETCH responses built from either, and a local plain-TCP IMAP server
+that answers from the same corpus with injected latency.
+"""
+from __future__ import annotations
+import asyncio
+import multiprocessing
+import threading
+import time
+
+
+# ── Messages ──────────────────────────────────────────────────────────────────
+
+def plain_message(uid: int) -> bytes:
+    """A ~3 KB text/plain message; sender, subject and Message-ID vary with `uid`."""
+    body = (f"Hello,\r\n\r\nThis is synthetic message {uid} for the fetch benchmark.\r\n" * 40)
+    return (f"From: Sender {uid % 37} <s{uid % 37}@example.com>\r\n"
+            f"Subject: Benchmark message {uid}\r\n"
+            f"Date: Mon, 1 Jan 2024 10:00:00 +0000\r\n"
+            f"Message-ID: <{uid}@bench.local>\r\n"
+            f"Content-Type: text/plain; charset=utf-8\r\n\r\n{body}").encode()
+
+
+def newsletter_html(stories: int = 30) -> str:
+    """Table-layout marketing email in the style most newsletter builders emit."""
+    head = ("<!DOCTYPE html><html><head><meta charset='utf-8'><style type='text/css'>"
+            + "".join(f".c{i}{{font-family:Arial;color:#333;padding:{i}px}}\n" for i in range(60))
+            + "</style><!--[if mso]><xml><o:OfficeDocumentSettings></o:OfficeDocumentSettings></xml><![endif]-->"
+            "<script type='application/ld+json'>{\"@type\":\"EmailMessage\"}</script></head>"
+            "<body style='margin:0'><center><table role='presentation' width='100%' cellpadding='0'>")
+    story = ("<tr><td class='c{i}' style='padding:12px 24px'><table width='100%'><tr>"
+             "<td><img src='https://cdn.example.com/img/{i}.jpg' alt='' width='120'></td>"
+             "<td><h2 style='font-size:18px'>Story {i} &mdash; caf&eacute; prices &amp; more</h2>"
+             "<p style='line-height:1.5'>Lorem ipsum dolor sit amet, <b>consectetur</b> adipiscing elit, "
+             "sed do eiusmod tempor incididunt ut labore et dolore magna aliqua&hellip; "
+             "<a href='https://example.com/r/{i}?utm_source=newsletter&amp;utm_medium=email'>Read more&nbsp;&rarr;</a></p>"
+             "<ul><li>Price: &pound;{i}.99</li><li>Rating: &#9733;&#9733;&#9733;&#x2606;</li></ul>"
+             "</td></tr></table></td></tr>\n")
+    foot = ("<tr><td style='font-size:11px;color:#999'><p>You are receiving this email because you "
+            "subscribed at example.com.<br>Example Ltd, 1 High St, London &middot; "
+            "<a href='https://example.com/u'>Unsubscribe</a> &middot; &copy; 2024</p></td></tr>"
+            "</table></center><img src='https://t.example.com/o.gif' width='1' height='1'></body></html>")
+    return head + "".join(story.format(i=i) for i in range(stories)) + foot
+
+
+def newsletter_message(uid: int, stories: int = 25) -> bytes:
+    """newsletter_html() wrapped as a multipart/alternative message."""
+    return (f"From: News <news@example.com>\r\nSubject: Digest {uid}\r\n"
+            f"Date: Mon, 1 Jan 2024 10:00:00 +0000\r\nMessage-ID: <{uid}@news.example.com>\r\n"
+            f"MIME-Version: 1.0\r\nContent-Type: multipart/alternative; boundary=b\r\n\r\n"
+            f"--b\r\nContent-Type: text/html; charset=utf-8\r\n\r\n{newsletter_html(stories)}\r\n"
+            f"--b--\r\n").encode()
+
+
+def fetch_response(uids, message=plain_message) -> list:
+    """The data imaplib returns for `UID FETCH <uids> (UID BODY[])`, one message(uid) each."""
+    data = []
+    for uid in uids:
+        raw = message(uid)
+        data += [(b"%d (UID %d BODY[] {%d}" % (uid, uid, len(raw)), raw), b")"]
+    return data
+
+
+def expand_uid_set(uid_set: str) -> list[int]:
+    """UIDs named by an IMAP UID set such as "1:50,73"."""
+    out = []
+    for part in uid_set.split(","):
+        lo, _, hi = part.partition(":")
+        out.extend(range(int(lo), int(hi or lo) + 1))
+    return out
+
+
+# ── IMAP stand-in ─────────────────────────────────────────────────────────────
+
+def start_imap_server(n_messages: int, latency: float, per_message: float = 0.0,
+                      message=plain_message) -> int:
+    """
+    Serve UIDs 1..n_messages on 127.0.0.1 from a daemon thread and return
+    the port. Plain TCP, any login accepted; every tagged reply is delayed
+    by `latency` (a round-trip) and every FETCHed message by `per_message`
+    (server work).
+    """
+    async def handle(reader, writer):
+        writer.write(b"* OK [CAPABILITY IMAP4rev1] stand-in ready\r\n")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            tag, _, rest = line.rstrip(b"\r\n").partition(b" ")
+            cmd = rest.split(b" ")
+            name = cmd[0].upper()
+            if name == b"UID" and len(cmd) > 2:
+                name = b"UID " + cmd[1].upper()
+            await asyncio.sleep(latency)
+            if name == b"CAPABILITY":
+                writer.write(b"* CAPABILITY IMAP4rev1\r\n")
+            elif name in (b"SELECT", b"EXAMINE"):
+                writer.write(b"* %d EXISTS\r\n* OK [UIDVALIDITY 1] ok\r\n* OK [UIDNEXT %d] ok\r\n"
+                             % (n_messages, n_messages + 1))
+            elif name == b"UID FETCH":
+                for uid in expand_uid_set(cmd[2].decode()):
+                    if 1 <= uid <= n_messages:
+                        await asyncio.sleep(per_message)
+                        raw = message(uid)
+                        writer.write(b"* %d FETCH (UID %d BODY[] {%d}\r\n" % (uid, uid, len(raw)) + raw + b")\r\n")
+            elif name == b"LOGOUT":
+                writer.write(b"* BYE\r\n" + tag + b" OK LOGOUT\r\n")
+                await writer.drain()
+                break
+            writer.write(tag + b" OK done\r\n")
+            await writer.drain()
+        writer.close()
+
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(handle, "127.0.0.1", 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return server.sockets[0].getsockname()[1]
+
+
+def _serve(n_messages: int, latency: float, per_message: float, message, conn) -> None:
+    conn.send(start_imap_server(n_messages, latency, per_message, message))
+    while True:
+        time.sleep(3600)
+
+
+def start_imap_process(n_messages: int, latency: float, per_message: float = 0.0,
+                       message=plain_message) -> tuple[multiprocessing.Process, int]:
+    """
+    start_imap_server() in a child process, so the stand-in doesn't compete
+    for the GIL with the code being timed. Returns (process, port);
+    terminate the process when done.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=_serve, args=(n_messages, latency, per_message, message, child), daemon=True)
+    proc.start()
+    return proc, parent.recv()
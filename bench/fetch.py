@@ -0,0 +1,77 @@
+"""
+Wall-clock time of an unread fetch as the mailbox grows: one UID FETCH per
+message, batched UID FETCH on one connection (fetch_uids), and batches
+spread over parallel connections (fetch_uids_parallel), all against the
+local IMAP stand-in in bench/corpus.py.
+
+    python -m bench.fetch --sizes 50,200,1000,5000 --latency 0.02
+"""
+from __future__ import annotations
+import argparse
+import imaplib
+import time
+
+from bench import corpus
+from utils import email_utils, parse_pool
+
+
+def _single(port: int, uids: list[int], batch_size: int | None) -> list[dict]:
+    mail = imaplib.IMAP4("127.0.0.1", port)
+    mail.login("bench", "bench")
+    mail.select("inbox", readonly=True)
+    try:
+        if batch_size is None:
+            return email_utils.fetch_uids(mail, uids, uidvalidity=1)
+        return email_utils.fetch_uids(mail, uids, batch_size, uidvalidity=1)
+    finally:
+        mail.logout()
+
+
+def _parallel(port: int, uids: list[int], batch_size: int | None, connections: int | None) -> list[dict]:
+    kwargs = {"host": "127.0.0.1", "port": port, "use_ssl": False}
+    if batch_size is not None:
+        kwargs["batch_size"] = batch_size
+    if connections is not None:
+        kwargs["connections"] = connections
+    return email_utils.fetch_uids_parallel("bench", "bench", uids, **kwargs)
+
+
+def _timed(fn, *args) -> tuple[float, list[dict]]:
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fetch wall-clock time by mailbox size.")
+    parser.add_argument("--sizes", default="50,200,1000,5000", help="comma-separated message counts")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every reply")
+    parser.add_argument("--per-message", type=float, default=0.0005, help="seconds of server work per message")
+    parser.add_argument("--batch-size", type=int, help="UIDs per FETCH (default: the app's)")
+    parser.add_argument("--connections", type=int, help="parallel connections (default: the app's)")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    # A running app already has its parse workers — don't time their start-up
+    warm = parse_pool.submit(abs, 0)
+    if warm is not None:
+        warm.result()
+
+    print(f"{args.latency * 1000:.0f} ms per round-trip, {args.per_message * 1000:.1f} ms server work per message")
+    print(f"{'messages':>8}{'per message':>14}{'batched':>11}{'parallel':>11}{'batched ×':>12}{'parallel ×':>12}")
+    for n in sizes:
+        port = corpus.start_imap_server(n, args.latency, args.per_message)
+        uids = list(range(1, n + 1))
+        t_one, one = _timed(_single, port, uids, 1)
+        t_bat, bat = _timed(_single, port, uids, args.batch_size)
+        t_par, par = _timed(_parallel, port, uids, args.batch_size, args.connections)
+        ids = [em["id"] for em in one]
+        assert len(ids) == n, f"per-message fetch returned {len(ids)} of {n} messages"
+        assert [em["id"] for em in bat] == ids, "batched fetch returned different messages"
+        assert [em["id"] for em in par] == ids, "parallel fetch returned different messages"
+        print(f"{n:>8}{t_one:>13.2f}s{t_bat:>10.2f}s{t_par:>10.2f}s"
+              f"{t_one / t_bat:>11.1f}×{t_one / t_par:>11.1f}×")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+html_to_text against the regex cascade it replaced, on saved newsletters
+or built-in table-layout samples.
+
+    python -m bench.html_text [newsletter.html ...]
+"""
+from __future__ import annotations
+import argparse
+import html as _html
+import re
+import timeit
+
+from bench import corpus
+from utils.html_text import html_to_text
+
+
+def _cascade_html_to_text(html: str) -> str:
+    """The regex cascade html_to_text() replaced."""
+    html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.DOTALL | re.IGNORECASE)
+    html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.DOTALL | re.IGNORECASE)
+    html = re.sub(r'<!--.*?-->', '', html, flags=re.DOTALL)
+    for tag in ['p', 'br', 'div', 'tr', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote']:
+        html = re.sub(rf'</?{tag}[^>]*>', '\n', html, flags=re.IGNORECASE)
+    html = re.sub(r'<[^>]+>', '', html)
+    for ent, ch in (('&nbsp;', ' '), ('&amp;', '&'), ('&lt;', '<'), ('&gt;', '>'),
+                    ('&quot;', '"'), ('&#39;', "'"), ('&apos;', "'")):
+        html = html.replace(ent, ch)
+    html = re.sub(r'&#(\d+);',            lambda m: chr(int(m.group(1))), html)
+    html = re.sub(r'&#x([0-9a-fA-F]+);', lambda m: chr(int(m.group(1), 16)), html)
+    html = re.sub(r'[ \t]+',  ' ',    html)
+    html = re.sub(r' *\n *',  '\n',   html)
+    html = re.sub(r'\n{3,}',  '\n\n', html)
+    # ...and the inbox ran a second strip over the result when it rendered each card
+    html = re.sub(r'<(style|script)[^>]*>.*?</(style|script)>', '', html, flags=re.DOTALL | re.IGNORECASE)
+    html = re.sub(r'<[^>]+>', '', html)
+    html = _html.unescape(html)
+    html = re.sub(r'\n{3,}', '\n\n', html)
+    return html.strip()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark html_to_text against the old regex cascade.")
+    parser.add_argument("files", nargs="*", help="saved newsletter .html files (default: built-in samples)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = [(path, open(path, encoding="utf-8", errors="replace").read()) for path in args.files]
+    if not docs:
+        docs = [(f"sample, {n} stories", corpus.newsletter_html(n)) for n in (5, 30, 200)]
+
+    print(f"{'document':<28}{'size':>9}{'cascade':>12}{'html_to_text':>14}{'speed-up':>10}")
+    for name, doc in docs:
+        number = max(1, 2_000_000 // max(len(doc), 1))
+        old = min(timeit.repeat(lambda: _cascade_html_to_text(doc), number=number, repeat=args.repeat)) / number
+        new = min(timeit.repeat(lambda: html_to_text(doc), number=number, repeat=args.repeat)) / number
+        print(f"{name[:27]:<28}{len(doc) / 1024:>7.1f}KB{old * 1e3:>10.2f}ms{new * 1e3:>12.2f}ms{old / new:>9.1f}×")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+MIME parsing throughput inline vs in worker processes, on HTML newsletters
+cut into the FETCH responses the inbox would receive; then the same corpus
+fetched from the IMAP stand-in, parsed after each download vs pipelined
+through parse_pool by fetch_uids. Worker start-up is paid once per app, so
+it is left out of the timings.
+
+    python -m bench.parse_pool --messages 1200
+"""
+from __future__ import annotations
+import argparse
+import imaplib
+import inspect
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench import corpus
+from utils import email_utils, parse_pool
+
+_DEFAULT_BATCH = inspect.signature(email_utils.fetch_uids).parameters["batch_size"].default
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure MIME parsing throughput inline vs in worker processes.")
+    parser.add_argument("--messages", type=int, default=1200)
+    parser.add_argument("--batch-size", type=int, default=_DEFAULT_BATCH)
+    parser.add_argument("--workers", help="comma-separated pool sizes (default: 1, 2, 4 and the CPU count)")
+    parser.add_argument("--latency", type=float, default=0.02, help="stand-in seconds per round-trip")
+    parser.add_argument("--per-message", type=float, default=0.004,
+                        help="stand-in seconds per message (a ~30 KB newsletter at ~60 Mbit/s)")
+    args = parser.parse_args()
+
+    uids = list(range(1, args.messages + 1))
+    batches = [corpus.fetch_response(uids[i:i + args.batch_size], corpus.newsletter_message)
+               for i in range(0, len(uids), args.batch_size)]
+    t0 = time.perf_counter()
+    inline = [r for b in batches for r in email_utils.fetch_records(b, 1, False)]
+    t_inline = time.perf_counter() - t0
+    print(f"{args.messages} HTML newsletters, {len(batches)} batches, {os.cpu_count()} CPU(s)")
+    print(f"inline              {t_inline:6.2f} s   {args.messages / t_inline:7.0f} msg/s")
+
+    counts = ([int(w) for w in args.workers.split(",")] if args.workers
+              else sorted({1, 2, 4, os.cpu_count() or 1}))
+    for workers in counts:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            list(pool.map(abs, range(4 * workers)))
+            t0 = time.perf_counter()
+            futs = [pool.submit(email_utils.fetch_records, b, 1, False) for b in batches]
+            pooled = [r for f in futs for r in f.result()]
+            elapsed = time.perf_counter() - t0
+        assert [r["body"] for r in pooled] == [r["body"] for r in inline]
+        print(f"{workers} worker{'s' if workers > 1 else ' '}           {elapsed:6.2f} s   "
+              f"{args.messages / elapsed:7.0f} msg/s   ({t_inline / elapsed:.1f}×)")
+
+    proc, port = corpus.start_imap_process(args.messages, args.latency, args.per_message,
+                                           corpus.newsletter_message)
+    warm = parse_pool.submit(abs, 0)
+    if warm is not None:
+        warm.result()
+    try:
+        mail = imaplib.IMAP4("127.0.0.1", port)
+        mail.login("bench", "bench")
+        mail.select("inbox", readonly=True)
+        t0 = time.perf_counter()
+        sequential = []
+        for i in range(0, len(uids), args.batch_size):
+            _, data = mail.uid("FETCH", f"{uids[i]}:{uids[min(i + args.batch_size, len(uids)) - 1]}",
+                               "(UID BODY.PEEK[])")
+            sequential += email_utils.fetch_records(data, 1, False)
+        t_seq = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        pipelined = email_utils.fetch_uids(mail, uids, args.batch_size, uidvalidity=1)
+        t_pipe = time.perf_counter() - t0
+        mail.logout()
+    finally:
+        proc.terminate()
+    assert [r["body"] for r in pipelined] == [r["body"] for r in sequential]
+    print(f"\nfetch + parse, {args.latency * 1000:.0f} ms per round-trip, "
+          f"{args.per_message * 1000:.1f} ms per message on the wire")
+    print(f"parse after each batch  {t_seq:6.2f} s")
+    print(f"pipelined (parse_pool)  {t_pipe:6.2f} s   ({t_seq / t_pipe:.2f}×)")
+
+
+if __name__ == "__main__":
+    main()
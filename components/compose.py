@@ -1,7 +1,7 @@
 import streamlit as st
 import html as _html_mod
 from utils.email_utils import send_email
-from utils.ai_utils import ai_compose, parse_draft
+from utils.ai_utils import ai_compose_stream, parse_draft, render_compose_preview, stream_to
 
 
 def render_compose(email_addr: str, app_pass: str) -> None:
@@ -165,14 +165,16 @@ def render_compose(email_addr: str, app_pass: str) -> None:
 
         brief = st.text_area("Your brief", placeholder="", height=100, key="ai_brief_input")
 
-        if st.button("✦ Generate Draft", key="ai_generate", use_container_width=True):
+        generate = st.button("✦ Generate Draft", key="ai_generate", use_container_width=True)
+        # Streamed drafts render here token by token, then move into the editable box
+        stream_box = st.empty()
+        if generate:
             if not st.session_state.credentials_ok:
                 st.error("Connect your account in the sidebar first.")
             elif not brief.strip():
                 st.warning("Write a brief above first.")
             else:
-                with st.spinner("Drafting…"):
-                    raw = ai_compose(brief)
+                raw = stream_to(stream_box, ai_compose_stream(brief), render=render_compose_preview)
                 if raw.startswith("[quota]"):
                     st.warning("⏳ " + raw[7:].strip())
                 elif raw.startswith("[error]"):
@@ -214,8 +216,8 @@ def render_compose(email_addr: str, app_pass: str) -> None:
             with br:
                 if st.button("🔄 Regenerate", key="ai_regen", use_container_width=True):
                     if brief.strip():
-                        with st.spinner("Regenerating…"):
-                            raw = ai_compose(brief, regenerate=True)
+                        raw = stream_to(stream_box, ai_compose_stream(brief, regenerate=True),
+                                        render=render_compose_preview)
                         if raw.startswith("[quota]"):
                             st.warning("⏳ " + raw[7:].strip())
                         elif raw.startswith("[error]"):
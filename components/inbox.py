@@ -1,29 +1,22 @@
 from __future__ import annotations
 import re
-import html as html_module
 import html as _html          # top-level so _render_card doesn't re-import on every card
 from datetime import datetime, timezone
 from email.utils import parsedate_to_datetime
 
-
-def _strip_html(text: str) -> str:
-    """Remove HTML tags and unescape HTML entities for clean plain-text display."""
-    if not text:
-        return text
-    # Remove style/script blocks entirely
-    text = re.sub(r'<(style|script)[^>]*>.*?</(style|script)>', '', text, flags=re.DOTALL | re.IGNORECASE)
-    # Remove all remaining HTML tags
-    text = re.sub(r'<[^>]+>', '', text)
-    # Unescape HTML entities (e.g. &amp; → &, &lt; → <)
-    text = html_module.unescape(text)
-    # Collapse excessive whitespace/blank lines
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    return text.strip()
-
 import streamlit as st
-from utils.email_utils import fetch_emails, send_email, delete_email, format_size
-from utils.ai_utils import ai_analyze_email
-from utils.read_state import mark_read, bulk_read_ids
+from utils.email_utils import (
+    fetch_email_body, fetch_attachment, delete_emails, format_size,
+)
+from utils.ai_utils import CATEGORIES, ai_classify_email, ai_draft_reply_stream, ai_analyze_many, stream_to
+from utils.sync import sync_unseen
+from utils import store
+from utils.read_state import identity as read_identity, mark_read, bulk_read_ids
+from utils.rules import classify_locally, local_summary, stats as rules_stats
+from utils import classifier
+from utils import jobs
+from utils import watcher
+from utils import imap_pool
 
 SORT_OPTIONS  = ["Newest First", "Oldest First", "Sender A→Z", "Sender Z→A", "Subject A→Z", "Has Attachments"]
 GROUP_OPTIONS = ["None", "Category", "Sender", "Date"]
@@ -35,6 +28,14 @@ _CAT_COLOR = {
     "Important": "var(--coral)",  "Promotions": "var(--blue)",
     "Updates":   "var(--cyan)",   "Others":     "var(--violet)",
 }
+# Tab ids; every card is drawn once in "all" and once in its category tab
+_ALL_TAB_IDS = ("all", "imp", "pro", "upd", "oth")
+# Per-card state keys that embed the message key, e.g. "all_chk_61:3042", "read_61:3042"
+_CARD_WIDGET_KEY = re.compile(
+    rf"^(?:read|show_imgs|(?:{'|'.join(_ALL_TAB_IDS)})_(?:chk|draft|cat|showimg))_(\d+:\d+)$"
+)
+# "Unread to fetch" choices; above one fetch batch (50) the download runs in parallel
+_FETCH_LIMITS = (20, 50, 100, 200)
 _ATT_ICONS = {
     "image": "🖼️", "application/pdf": "📄",
     "application/zip": "🗜️", "text": "📝",
@@ -98,11 +99,22 @@ def _apply_sort(items, sort_by):
     return items
 
 
+def _store_sort(items, sort_by):
+    """Order items by the indexed store query; None if the store can't order them all."""
+    account = st.session_state.get("store_account")
+    if not account:
+        return None
+    pos = {uid: n for n, uid in enumerate(store.ordered_uids(account, "inbox", sort_by))}
+    if not all(em.get("uid") in pos for _, em in items):
+        return None
+    return sorted(items, key=lambda x: pos[x[1]["uid"]])
+
+
 def _apply_search(items, query):
     if not query.strip():
         return items
     q = query.lower()
-    return [(i, em) for i, em in items
+    return [(mid, em) for mid, em in items
             if q in (em.get("subject") or "").lower()
             or q in (em.get("from") or "").lower()
             or q in (em.get("body") or "").lower()]
@@ -112,26 +124,289 @@ def _group_emails(items, group_by, categories):
     if group_by == "Category":
         order = ["Important", "Promotions", "Updates", "Others"]
         groups = {k: [] for k in order}
-        for i, em in items:
-            groups.setdefault(categories.get(i, "Others"), []).append((i, em))
+        for mid, em in items:
+            groups.setdefault(categories.get(mid, "Others"), []).append((mid, em))
         return {k: v for k, v in groups.items() if v}
 
     if group_by == "Sender":
         groups: dict = {}
-        for i, em in items:
-            groups.setdefault(_sender_name(em.get("from", "Unknown")), []).append((i, em))
+        for mid, em in items:
+            groups.setdefault(_sender_name(em.get("from", "Unknown")), []).append((mid, em))
         return dict(sorted(groups.items(), key=lambda x: x[0].lower()))
 
     if group_by == "Date":
         order_map = {"Today": 0, "Yesterday": 1, "This Week": 2, "This Month": 3, "Older": 4}
         groups: dict = {}
-        for i, em in items:
-            groups.setdefault(_date_bucket(em.get("date", "")), []).append((i, em))
+        for mid, em in items:
+            groups.setdefault(_date_bucket(em.get("date", "")), []).append((mid, em))
         return dict(sorted(groups.items(), key=lambda x: order_map.get(x[0], 9)))
 
     return {"": items}
 
 
+def _install_emails(emails: list, analyses: list | None = None, full: bool = False) -> None:
+    """
+    Swap in a freshly synced/loaded email list. Session results (AI output,
+    sent flags, …) are keyed by the stable message key em["id"], so they
+    carry over as they are; entries for mail that is gone are dropped and
+    gaps are filled from `analyses`.
+    """
+    live = {em["id"] for em in emails}
+    keep = lambda d: {k: v for k, v in d.items() if k in live}
+    st.session_state.update({
+        "emails":              emails,
+        "fetched":             True,
+        "categories":          keep(st.session_state.categories),
+        "summaries":           keep(st.session_state.summaries),
+        "drafts":              keep(st.session_state.drafts),
+        "sent_flags":          keep(st.session_state.sent_flags),
+        "reply_att_gen":       keep(st.session_state.reply_att_gen),
+        "deleted_ids":         {m for m in st.session_state.get("deleted_ids", ()) if m in live},
+        "bulk_delete_confirm": False,
+    })
+    for em, a in zip(emails, analyses or []):
+        if a.get("category") and em["id"] not in st.session_state.categories:
+            st.session_state.categories[em["id"]] = a["category"]
+            st.session_state.summaries[em["id"]]  = a.get("summary") or ""
+            st.session_state.drafts[em["id"]]     = a.get("draft") or ""
+    if full:
+        st.session_state.att_cache = {}
+
+    # Drop widget state belonging to mail that is no longer listed
+    for k in list(st.session_state.keys()):
+        m = _CARD_WIDGET_KEY.match(k)
+        if m and m.group(1) not in live:
+            del st.session_state[k]
+    # Restore persistent read flags
+    persisted_read = bulk_read_ids()   # set[str]
+    for em in emails:
+        if read_identity(em) in persisted_read:
+            st.session_state[f"read_{em['id']}"] = True
+
+
+def _classify_offline(em: dict) -> tuple[dict | None, str]:
+    """
+    Header rules first, then the on-device model (mail with a body or preview).
+    Returns (result, label_source), or (None, "") when Gemini is needed.
+    """
+    result = classify_locally(em)
+    if result is not None:
+        return result, "rules"
+    if _has_text(em):
+        guess = classifier.classify(em)
+        if guess is not None:
+            summary = local_summary(em.get("body", "")) or em.get("subject", "")
+            return {"category": guess["category"], "summary": summary, "draft": ""}, "model"
+    return None, ""
+
+
+def _has_text(em: dict) -> bool:
+    """Full body loaded, or a headers-first card with a preview to analyse."""
+    return em.get("body_loaded", True) or bool(em.get("body"))
+
+
+def _ai_failed(result: dict) -> bool:
+    # An empty summary means the call failed and the category is only the "Others" default
+    return not result.get("summary")
+
+
+def _learn_ai_label(em: dict, result: dict) -> None:
+    if not _ai_failed(result):
+        classifier.learn(em, result["category"], source="ai")
+
+
+def _analyse_pending(account: str) -> bool:
+    """
+    Categorise loaded emails that have no result yet. Obvious mail (bulk,
+    noreply, calendar) is handled by local rules; only the rest goes to
+    Gemini. True if anything was categorised.
+    """
+    emails  = st.session_state.emails
+    pending = [
+        em for em in emails
+        if em["id"] not in st.session_state.categories and not em.get("rules_checked")
+    ]
+    if not pending:
+        return False
+
+    ambiguous, n_local = [], 0
+    for em in pending:
+        em["rules_checked"] = True   # cards without a preview are re-checked by _load_body
+        result, source = _classify_offline(em)
+        if result is None:
+            if _has_text(em):
+                ambiguous.append(em)
+            continue
+        n_local += 1
+        st.session_state.categories[em["id"]] = result["category"]
+        st.session_state.summaries[em["id"]]  = result["summary"]
+        st.session_state.drafts[em["id"]]     = ""
+        store.save_analysis(account, "inbox", em["uid"], category=result["category"],
+                            summary=result["summary"], source=source)
+    if not ambiguous:
+        return n_local > 0
+
+    st.success(
+        f"Found **{len(pending)}** new unread email(s) — {n_local} sorted locally. "
+        f"Running AI analysis on {len(ambiguous)}…"
+    )
+    bar = st.progress(0)
+    by_id = {em["id"]: em for em in ambiguous}
+    to_analyse = [(em["id"], em["subject"], em["body"]) for em in ambiguous]
+    # Results arrive out of order from the worker pool — progress counts completions
+    for n_done, (mid, result) in enumerate(ai_analyze_many(to_analyse), 1):
+        bar.progress(n_done / len(ambiguous), text=f"Analysed {n_done} of {len(ambiguous)}")
+        if _ai_failed(result):
+            by_id[mid]["rules_checked"] = False   # nothing stored — the next fetch retries it
+            continue
+        st.session_state.categories[mid] = result["category"]
+        st.session_state.summaries[mid]  = result["summary"]
+        st.session_state.drafts[mid]     = result["draft"]
+        store.save_analysis(account, "inbox", by_id[mid]["uid"], category=result["category"],
+                            summary=result["summary"], source="ai")
+        _learn_ai_label(by_id[mid], result)
+    bar.empty()
+    classifier.save()
+    return True
+
+
+def _verified(account: str, app_pass: str) -> bool:
+    """True once this session's address + app password have logged in to Gmail."""
+    if st.session_state.store_verified == imap_pool.account_token(account, app_pass):
+        return True
+    try:
+        with st.spinner("Signing in to Gmail…"):
+            st.session_state.store_verified = imap_pool.verify(account, app_pass)
+    except Exception:
+        st.session_state.store_verified = ""
+        st.error("Couldn't sign in to Gmail. Please check your Gmail address and App Password.")
+        return False
+    return True
+
+
+def _load_from_store(account: str, app_pass: str) -> bool:
+    """
+    First render of a session: show the stored inbox. Later renders: pick up
+    whatever the account's watcher (or another tab) stored since. The store
+    is keyed by address only, so nothing is shown until these credentials
+    have logged in to Gmail in this session. Returns True once the watcher
+    is running.
+    """
+    if not _verified(account, app_pass):
+        return False
+    # IDLE watcher: syncs on connect and again whenever Gmail reports a change
+    watcher.watch(account, app_pass, headers_only=st.session_state.lazy_bodies,
+                  limit=st.session_state.fetch_limit)
+    state, gen = store.load_sync_state(account, "inbox")
+    if state is None:
+        # Nothing stored yet: the watcher's first sync bumps gen and reruns the page
+        st.session_state.store_generation = gen
+        return True
+    first = not st.session_state.fetched or st.session_state.store_account != account
+    if not first and gen == st.session_state.store_generation:
+        return True
+
+    emails, analyses = store.load_mailbox(account, "inbox")
+    st.session_state.sync_state[(account, "inbox")] = state
+    st.session_state.store_account    = account
+    st.session_state.store_generation = gen
+    _install_emails(emails, analyses, full=first)
+    # Only mail without a stored result is analysed — new arrivals after a push
+    if _analyse_pending(account):
+        st.rerun()
+    return True
+
+
+def _sync_summary(res: dict) -> str:
+    n_new, n_gone, n_chg = len(res["new"]), len(res["removed"]), len(res["changed"])
+    if not (n_new or n_gone or n_chg):
+        return "✓ Up to date — no new mail since the last fetch."
+    parts = []
+    if n_new:
+        parts.append(f"{n_new} new")
+    if n_gone:
+        parts.append(f"{n_gone} read or removed elsewhere")
+    if n_chg:
+        parts.append(f"{n_chg} updated")
+    msg = "📬 Synced — " + ", ".join(parts) + "."
+    skipped = rules_stats()
+    if skipped["checked"]:
+        msg += f" {skipped['skip_rate']:.0%} sorted by local rules without an AI call."
+    return msg
+
+
+# ── Background jobs ────────────────────────────────────────────────────────────
+
+def _job_error(job: dict) -> str:
+    subject = job["label"] or "(No Subject)"
+    msg = job["error"].lower()
+    action = "delete" if job["kind"] == "delete" else "send"
+    if "auth" in msg or "login" in msg or "password" in msg:
+        return f"Failed to {action}: Authentication error. Please reconnect your account."
+    if job["kind"] == "delete":
+        if "already be gone" in msg:
+            return f"Failed to delete “{subject}”. It may have been deleted or moved in Gmail."
+        return f"Failed to delete “{subject}”. Please check your connection and try again."
+    if "size" in msg or "large" in msg or "too big" in msg:
+        return f"Failed to send reply to “{subject}”: {job['error']}"
+    return f"Failed to send reply to “{subject}”. Please check your connection and try again."
+
+
+def _collect_jobs() -> None:
+    """Turn finished background jobs into flash messages; undo optimistic updates that failed."""
+    finished, st.session_state.jobs = jobs.collect(st.session_state.jobs)
+    sent, deleted, errors = 0, 0, []
+    for job in finished:
+        mid = job["ref"]
+        if job["status"] == "done":
+            sent    += job["kind"] == "send"
+            deleted += job["kind"] == "delete"
+        elif job["kind"] == "send":
+            st.session_state.sent_flags.pop(mid, None)
+            errors.append(_job_error(job))
+        else:
+            st.session_state.deleted_ids.discard(mid)
+            errors.append(_job_error(job))
+    if sent:
+        st.session_state.inbox_reply_sent_msg = "✅ Reply sent!" if sent == 1 else f"✅ {sent} replies sent!"
+    if deleted:
+        st.session_state.inbox_flash_msg = f"🗑️ {deleted} email{'s' if deleted != 1 else ''} deleted."
+    if errors:
+        st.session_state.inbox_error_msg = " ".join(errors)
+
+
+def _job_progress() -> None:
+    """Shown while jobs run; as a fragment it polls and reruns the page when one finishes."""
+    finished, active = jobs.collect(st.session_state.jobs)
+    if finished:
+        st.rerun()
+    if active:
+        st.caption(f"⏳ {len(active)} Gmail operation{'s' if len(active) != 1 else ''} in progress…")
+
+
+_WATCH_LABEL = {
+    "idle":     "⚡ Live — new mail appears automatically",
+    "poll":     "🔄 Checking for new mail periodically",
+    "offline":  "⚠️ Gmail unreachable — retrying",
+    "starting": "⏳ Connecting for live updates…",
+}
+
+
+def _live_updates(account: str) -> None:
+    """Watcher status; as a fragment it reruns the page when the watcher stored new mail."""
+    _, gen = store.load_sync_state(account, "inbox")
+    if gen != st.session_state.store_generation:
+        st.rerun()
+    label = _WATCH_LABEL.get(watcher.mode(account))
+    if label:
+        st.caption(label)
+
+
+if hasattr(st, "fragment"):   # Streamlit ≥ 1.37 — older versions pick results up on the next interaction
+    _job_progress = st.fragment(run_every=2)(_job_progress)
+    _live_updates = st.fragment(run_every=3)(_live_updates)
+
+
 # ── Main render ────────────────────────────────────────────────────────────────
 
 def render_inbox(email_addr: str, app_pass: str) -> None:
@@ -145,14 +420,34 @@ def render_inbox(email_addr: str, app_pass: str) -> None:
     with col_b:
         st.markdown("<div style='margin-top:1.1rem'></div>", unsafe_allow_html=True)
         fetch_clicked = st.button("📬 Fetch Emails", key="btn_fetch")
+        st.toggle("Headers first", key="lazy_bodies",
+                  help="List emails from headers and a short preview of each body; the full "
+                       "message is downloaded when you open it. Faster on large inboxes.")
+        st.selectbox("Unread to fetch", _FETCH_LIMITS, key="fetch_limit",
+                     help="Newest unread emails to list. Larger fetches download over "
+                          "several connections at once.")
+        live_slot = st.empty()
 
     # Show persistent flash messages (reply sent, inbox-zero, etc.) that survive rerun
+    _collect_jobs()
+    if st.session_state.get("inbox_error_msg"):
+        st.error(st.session_state.inbox_error_msg)
+        st.session_state.inbox_error_msg = ""
     if st.session_state.get("inbox_reply_sent_msg"):
         st.success(st.session_state.inbox_reply_sent_msg)
         st.session_state.inbox_reply_sent_msg = ""
     if st.session_state.get("inbox_flash_msg"):
         st.info(st.session_state.inbox_flash_msg)
         st.session_state.inbox_flash_msg = ""
+    if st.session_state.jobs:
+        _job_progress()
+
+    # Draw instantly from the local store; a background sync reconciles with Gmail
+    if st.session_state.credentials_ok and email_addr and not fetch_clicked:
+        # After the store load, so a full run never sees a stale generation
+        if _load_from_store(email_addr, app_pass):
+            with live_slot.container():
+                _live_updates(email_addr)
 
     if fetch_clicked:
         if not st.session_state.credentials_ok:
@@ -160,42 +455,28 @@ def render_inbox(email_addr: str, app_pass: str) -> None:
         else:
             with st.spinner("Connecting to Gmail…"):
                 try:
-                    emails = fetch_emails(email_addr, app_pass)
-                    st.session_state.update({
-                        "emails":              emails,
-                        "fetched":             True,
-                        "categories":          {},
-                        "summaries":           {},
-                        "drafts":              {},
-                        "sent_flags":          {},
-                        "reply_att_gen":       {},
-                        "deleted_indices":     set(),
-                        "bulk_delete_confirm": False,
-                    })
-                    # Restore persistent read flags using stable email IDs
-                    persisted_read = bulk_read_ids()   # set[str]
-                    for k in list(st.session_state.keys()):
-                        if k.startswith("read_"):
-                            del st.session_state[k]
-                    for i, em in enumerate(emails):
-                        raw_id = em.get("id", b"")
-                        # em["id"] comes from IMAP as bytes; persisted_read stores strings
-                        str_id = raw_id.decode("utf-8", errors="replace") if isinstance(raw_id, bytes) else str(raw_id)
-                        if str_id in persisted_read:
-                            st.session_state[f"read_{i}"] = True
+                    sync_key    = (email_addr, "inbox")
+                    prev_state  = st.session_state.sync_state.get(sync_key)
+                    prev_emails = st.session_state.emails if prev_state else []
+                    res    = sync_unseen(email_addr, app_pass, prev_emails, prev_state,
+                                         limit=st.session_state.fetch_limit,
+                                         headers_only=st.session_state.lazy_bodies)
+                    emails = res["emails"]
+                    st.session_state.store_verified = imap_pool.account_token(email_addr, app_pass)
+                    st.session_state.sync_state[sync_key] = res["state"]
+                    st.session_state.store_generation = store.replace_mailbox(
+                        email_addr, "inbox", emails, res["state"])
+                    st.session_state.store_account = email_addr
+                    _install_emails(emails, full=res["full"])
+
                     if not emails:
                         st.session_state.inbox_flash_msg = "🎉 Inbox zero — no unread emails found! Click Fetch Emails again to check for new mail."
                         st.rerun()
                     else:
-                        st.success(f"Found **{len(emails)}** unread email(s). Running AI analysis…")
-                        bar = st.progress(0)
-                        for i, em in enumerate(emails):
-                            result = ai_analyze_email(em["subject"], em["body"])
-                            st.session_state.categories[i] = result["category"]
-                            st.session_state.summaries[i]  = result["summary"]
-                            st.session_state.drafts[i]     = result["draft"]
-                            bar.progress((i + 1) / len(emails))
-                        bar.empty()
+                        # Headers-first cards are analysed when loaded, everything else now
+                        _analyse_pending(email_addr)
+                        if not res["full"]:
+                            st.session_state.inbox_flash_msg = _sync_summary(res)
                         st.rerun()
                 except Exception as e:
                     msg = str(e).lower()
@@ -232,19 +513,20 @@ def render_inbox(email_addr: str, app_pass: str) -> None:
             """, unsafe_allow_html=True)
         return
 
-    # ── Ensure deleted_indices exists (backwards compat) ──────────────────────
-    if "deleted_indices" not in st.session_state:
-        st.session_state.deleted_indices = set()
+    # ── Ensure deleted_ids exists (backwards compat) ──────────────────────────
+    if "deleted_ids" not in st.session_state:
+        st.session_state.deleted_ids = set()
 
-    n    = len(st.session_state.emails)
-    ndel = len(st.session_state.deleted_indices)
+    ids  = [em["id"] for em in st.session_state.emails]
+    n    = len(ids)
+    ndel = len(st.session_state.deleted_ids)
     nvis = n - ndel
 
     # ── Stats + Toolbar — fully unified layout ────────────────────────────────
     vis_cats = [
-        st.session_state.categories.get(i, "Others")
-        for i in range(n)
-        if i not in st.session_state.deleted_indices
+        st.session_state.categories.get(mid, "Others")
+        for mid in ids
+        if mid not in st.session_state.deleted_ids
     ]
     n_imp = vis_cats.count("Important")
     n_pro = vis_cats.count("Promotions")
@@ -321,18 +603,17 @@ def render_inbox(email_addr: str, app_pass: str) -> None:
     st.markdown("<div style='height:0.4rem'></div>", unsafe_allow_html=True)
 
     # ── Bulk action bar — always visible when emails are loaded ───────────────
-    # IMPORTANT: checkboxes are keyed as "{tab_id}_chk_{idx}" (e.g. "all_chk_0").
-    # We must read from those keys directly — NOT from bare "chk_{i}" which is
+    # IMPORTANT: checkboxes are keyed as "{tab_id}_chk_{mid}" (e.g. "all_chk_61:3042").
+    # We must read from those keys directly — NOT from bare "chk_{mid}" which is
     # always one render behind. An email is "selected" if it is checked in ANY tab.
-    _ALL_TAB_IDS = ["all", "imp", "pro", "upd", "oth"]
     selected = {
-        i for i in range(n)
-        if i not in st.session_state.deleted_indices
-        and any(st.session_state.get(f"{tid}_chk_{i}", False) for tid in _ALL_TAB_IDS)
+        mid for mid in ids
+        if mid not in st.session_state.deleted_ids
+        and any(st.session_state.get(f"{tid}_chk_{mid}", False) for tid in _ALL_TAB_IDS)
     }
 
-    has_deleted = bool(st.session_state.deleted_indices)
-    n_visible   = n - len(st.session_state.deleted_indices)
+    has_deleted = bool(st.session_state.deleted_ids)
+    n_visible   = n - len(st.session_state.deleted_ids)
 
     # Always render the action bar so users can discover Select All
     bar_cols = st.columns([2.2, 1.6, 1.6, 1.6, 1.6, 1.4])
@@ -360,9 +641,9 @@ def render_inbox(email_addr: str, app_pass: str) -> None:
         if st.button("☑ Select All", key="btn_select_all", use_container_width=True,
                      help="Select all visible emails"):
             for tid in _ALL_TAB_IDS:
-                for i in range(n):
-                    if i not in st.session_state.deleted_indices:
-                        st.session_state[f"{tid}_chk_{i}"] = True
+                for mid in ids:
+                    if mid not in st.session_state.deleted_ids:
+                        st.session_state[f"{tid}_chk_{mid}"] = True
             st.session_state.bulk_delete_confirm = False
             st.rerun()
 
@@ -370,8 +651,8 @@ def render_inbox(email_addr: str, app_pass: str) -> None:
         if st.button("☐ Deselect All", key="btn_deselect_all", use_container_width=True,
                      help="Clear all selections", disabled=not selected):
             for tid in _ALL_TAB_IDS:
-                for i in range(n):
-                    st.session_state.pop(f"{tid}_chk_{i}", None)
+                for mid in ids:
+                    st.session_state.pop(f"{tid}_chk_{mid}", None)
             st.session_state.bulk_delete_confirm = False
             st.rerun()
 
@@ -389,16 +670,29 @@ def render_inbox(email_addr: str, app_pass: str) -> None:
                          use_container_width=True, type="primary",
                          help="Click again to permanently delete"):
                 with st.spinner(f"Deleting {len(selected)} email(s) from Gmail…"):
-                    for i in selected:
-                        em = st.session_state.emails[i]
-                        delete_email(email_addr, app_pass, em["id"])
-                st.session_state.deleted_indices |= selected
-                for i in selected:
+                    # One UID STORE + one EXPUNGE for the whole selection
+                    uid_of  = {em["id"]: em["uid"] for em in st.session_state.emails if em["id"] in selected}
+                    try:
+                        results = delete_emails(email_addr, app_pass, uid_of.values())
+                    except Exception as e:
+                        st.session_state.bulk_delete_confirm = False
+                        msg = str(e).lower()
+                        st.session_state.inbox_error_msg = (
+                            "Failed to delete: Authentication error. Please reconnect your account."
+                            if "auth" in msg or "login" in msg or "password" in msg else
+                            "Failed to delete: couldn't reach Gmail. Please check your connection and try again.")
+                        st.rerun()
+                    done    = {mid for mid, uid in uid_of.items() if results.get(uid)}
+                    store.delete_messages(email_addr, "inbox", [uid_of[mid] for mid in done])
+                st.session_state.deleted_ids |= done
+                for mid in done:
                     for tid in _ALL_TAB_IDS:
-                        st.session_state.pop(f"{tid}_chk_{i}", None)
+                        st.session_state.pop(f"{tid}_chk_{mid}", None)
                 st.session_state.bulk_delete_confirm = False
+                failed = len(selected) - len(done)
                 st.session_state.inbox_flash_msg = (
-                    f"🗑️ {len(selected)} email{'s' if len(selected) != 1 else ''} deleted."
+                    f"🗑️ {len(done)} email{'s' if len(done) != 1 else ''} deleted."
+                    + (f" {failed} could not be deleted — they may already be gone from Gmail." if failed else "")
                 )
                 st.rerun()
 
@@ -410,13 +704,13 @@ def render_inbox(email_addr: str, app_pass: str) -> None:
         elif has_deleted:
             if st.button("↩ Restore View", key="btn_restore", use_container_width=True,
                          help="Restore soft-deleted emails to view"):
-                st.session_state.deleted_indices = set()
+                st.session_state.deleted_ids = set()
                 st.session_state.bulk_delete_confirm = False
                 st.rerun()
 
     with bar_cols[5]:
         if has_deleted:
-            nd = len(st.session_state.deleted_indices)
+            nd = len(st.session_state.deleted_ids)
             st.markdown(f"""
             <div style="font-family:'Outfit',sans-serif; font-size:0.75rem;
                         color:var(--t3); padding-top:0.55rem; text-align:right;">
@@ -435,11 +729,10 @@ def render_inbox(email_addr: str, app_pass: str) -> None:
     # ── Category tabs ──────────────────────────────────────────────────────────
     # Each tab gets a unique tab_id so widget keys never collide across tabs
     tab_labels = ["All", "🔴 Important", "🔵 Promotions", "🟢 Updates", "🟡 Others"]
-    tab_ids    = ["all", "imp", "pro", "upd", "oth"]
     tab_filters = [None, "Important", "Promotions", "Updates", "Others"]
 
     tabs = st.tabs(tab_labels)
-    for tab, tab_id, filt in zip(tabs, tab_ids, tab_filters):
+    for tab, tab_id, filt in zip(tabs, _ALL_TAB_IDS, tab_filters):
         with tab:
             _render_tab(tab_id, filt, email_addr, app_pass)
 
@@ -447,15 +740,15 @@ def render_inbox(email_addr: str, app_pass: str) -> None:
 # ── Tab renderer ───────────────────────────────────────────────────────────────
 
 def _render_tab(tab_id: str, cat_filter, email_addr: str, app_pass: str) -> None:
-    deleted = st.session_state.deleted_indices
+    deleted = st.session_state.deleted_ids
 
     items = [
-        (i, em) for i, em in enumerate(st.session_state.emails)
-        if i not in deleted
-        and (not cat_filter or st.session_state.categories.get(i, "Others") == cat_filter)
+        (em["id"], em) for em in st.session_state.emails
+        if em["id"] not in deleted
+        and (not cat_filter or st.session_state.categories.get(em["id"], "Others") == cat_filter)
     ]
     items = _apply_search(items, st.session_state.inbox_search)
-    items = _apply_sort(items, st.session_state.inbox_sort)
+    items = _store_sort(items, st.session_state.inbox_sort) or _apply_sort(items, st.session_state.inbox_sort)
 
     if not items:
         q = st.session_state.inbox_search
@@ -468,12 +761,11 @@ def _render_tab(tab_id: str, cat_filter, email_addr: str, app_pass: str) -> None
         return
 
     # ── Per-tab Select All / Deselect Tab row ─────────────────────────────────
-    _ALL_TAB_IDS = ["all", "imp", "pro", "upd", "oth"]
-    tab_indices  = [i for i, _ in items]
+    tab_mids     = [mid for mid, _ in items]
     # An email counts as checked if it is ticked in ANY tab
     tab_checked  = [
-        any(st.session_state.get(f"{tid}_chk_{i}", False) for tid in _ALL_TAB_IDS)
-        for i in tab_indices
+        any(st.session_state.get(f"{tid}_chk_{mid}", False) for tid in _ALL_TAB_IDS)
+        for mid in tab_mids
     ]
     all_checked  = bool(tab_checked) and all(tab_checked)
 
@@ -483,12 +775,12 @@ def _render_tab(tab_id: str, cat_filter, email_addr: str, app_pass: str) -> None
         if st.button(label, key=f"{tab_id}_sel_all", use_container_width=True,
                      help="Select or deselect all emails in this tab"):
             new_val = not all_checked
-            for i in tab_indices:
+            for mid in tab_mids:
                 for tid in _ALL_TAB_IDS:
                     if new_val:
-                        st.session_state[f"{tid}_chk_{i}"] = True
+                        st.session_state[f"{tid}_chk_{mid}"] = True
                     else:
-                        st.session_state.pop(f"{tid}_chk_{i}", None)
+                        st.session_state.pop(f"{tid}_chk_{mid}", None)
             st.session_state.bulk_delete_confirm = False
             st.rerun()
     with sel_b:
@@ -520,19 +812,98 @@ def _render_tab(tab_id: str, cat_filter, email_addr: str, app_pass: str) -> None
             </div>
             """, unsafe_allow_html=True)
 
-        for idx, em in group_items:
-            _render_card(tab_id, idx, em, email_addr, app_pass)
-
+        for mid, em in group_items:
+            _render_card(tab_id, mid, em, email_addr, app_pass)
+
+
+
+# ── Lazy body loading ──────────────────────────────────────────────────────────
+
+def _cached_attachment(em: dict, att: dict):
+    """Attachment bytes if they were already downloaded this session, else None."""
+    if att.get("data") is not None:
+        return att["data"]
+    return st.session_state.att_cache.get((em.get("uid"), att.get("section")))
+
+
+def _attachment_bytes(em: dict, att: dict, email_addr: str, app_pass: str) -> bytes:
+    """Fetch one attachment part on demand and keep it for the rest of the session."""
+    data = _cached_attachment(em, att)
+    if data is None:
+        data = fetch_attachment(email_addr, app_pass, em["uid"], att["section"], att.get("encoding", ""))
+        st.session_state.att_cache[(em.get("uid"), att.get("section"))] = data
+    return data
+
+
+def _load_body(mid: str, em: dict, email_addr: str, app_pass: str) -> None:
+    """Download the full message for a headers-first card, then analyse it unless its preview was."""
+    with st.spinner("Loading message…"):
+        try:
+            parsed = fetch_email_body(email_addr, app_pass, em["uid"])
+        except Exception:
+            st.error("Failed to load this email. It may have been deleted or moved in Gmail.")
+            return
+        em.update(body=parsed["body"], attachments=parsed["attachments"], body_loaded=True)
+        store.save_body(email_addr, "inbox", em["uid"], em["body"], em["attachments"])
+        if mid in st.session_state.categories:
+            st.rerun()   # already analysed from its preview
+        result, source = _classify_offline(em)
+        if result is None:
+            result, source = ai_classify_email(em["subject"], em["body"]), "ai"
+            if _ai_failed(result):
+                em["rules_checked"] = False   # nothing stored — the next fetch retries it
+                st.rerun()
+            _learn_ai_label(em, result)
+            classifier.save()
+        store.save_analysis(email_addr, "inbox", em["uid"], category=result["category"],
+                            summary=result["summary"], source=source)
+    st.session_state.categories[mid] = result["category"]
+    st.session_state.summaries[mid]  = result["summary"]
+    st.session_state.drafts[mid]     = result["draft"]
+    st.rerun()
+
+
+def _recategorise(mid: str, em: dict, email_addr: str, widget_key: str) -> None:
+    category = st.session_state.get(widget_key)
+    if not category or category == st.session_state.categories.get(mid):
+        return
+    st.session_state.categories[mid] = category
+    # The same card is drawn in the All tab and its category tab — reset the other selector
+    for tab_id in _ALL_TAB_IDS:
+        if f"{tab_id}_cat_{mid}" != widget_key:
+            st.session_state.pop(f"{tab_id}_cat_{mid}", None)
+    store.save_analysis(email_addr, "inbox", em["uid"], category=category, source="user")
+    if em.get("body_loaded", True):
+        classifier.learn(em, category, source="user")
+        classifier.save()
+
+
+def _generate_draft(mid: str, em: dict, email_addr: str, widget_key: str,
+                    placeholder, regenerate: bool = False) -> None:
+    """Stream a reply draft into `placeholder`, then load it into the reply box."""
+    draft = stream_to(placeholder, ai_draft_reply_stream(em["subject"], em["body"], regenerate=regenerate),
+                      height=250)
+    if draft.startswith("[quota]"):
+        st.warning("⏳ " + draft[7:].strip())
+        return
+    if draft.startswith("[error]"):
+        st.error("❌ " + draft[7:].strip())
+        return
+    st.session_state.drafts[mid] = draft
+    store.save_analysis(email_addr, "inbox", em["uid"], draft=draft)
+    # Delete widget key so Streamlit re-renders with new value
+    st.session_state.pop(widget_key, None)
+    st.rerun()
 
 
 # ── Card renderer ──────────────────────────────────────────────────────────────
 
-def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str) -> None:
+def _render_card(tab_id: str, mid: str, em: dict, email_addr: str, app_pass: str) -> None:
     """
     tab_id is prepended to every widget key so the same email rendered
     in multiple tabs never produces duplicate keys.
     """
-    cat  = st.session_state.categories.get(idx, "Others")
+    cat  = st.session_state.categories.get(mid, "Others")
     sbj  = (em["subject"] or "(No Subject)")[:90]
     sdr  = em["from"][:65]
     dt   = em.get("date", "")
@@ -555,7 +926,7 @@ def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str
         att_badge = f"<span style='font-size:0.7rem;color:var(--blue);margin-left:6px;'>{' '.join(parts)}</span>"
 
 
-    is_read    = st.session_state.get(f"read_{idx}", False)
+    is_read    = st.session_state.get(f"read_{mid}", False)
     read_badge = "<span style='font-size:0.65rem; color:var(--t3); margin-left:6px;'>✓ read</span>" if is_read else ""
     card_opacity = "opacity:0.72;" if is_read else ""
     subject_weight = "font-weight:500; color:var(--t2);" if is_read else "font-weight:600; color:var(--t1);"
@@ -575,11 +946,11 @@ def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str
         st.markdown("<div style='padding-top:0.85rem;'></div>", unsafe_allow_html=True)
         # The checkbox key IS the source of truth — read initial value from the key itself
         # (which may have been set by Select All or a previous interaction).
-        # We no longer sync back to a bare "chk_{idx}" key — that caused the one-render lag.
-        current_val = st.session_state.get(f"{tab_id}_chk_{idx}", False)
+        # We no longer sync back to a bare "chk_{mid}" key — that caused the one-render lag.
+        current_val = st.session_state.get(f"{tab_id}_chk_{mid}", False)
         st.checkbox(
             "", value=current_val,
-            key=f"{tab_id}_chk_{idx}",
+            key=f"{tab_id}_chk_{mid}",
             label_visibility="collapsed",
         )
 
@@ -595,14 +966,21 @@ def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str
         """, unsafe_allow_html=True)
 
         with st.expander(f"↳  {sbj[:60]}"):
-            summary = st.session_state.summaries.get(idx, "")
+            summary = st.session_state.summaries.get(mid, "")
+
+            # Headers-first fetch: body and attachments are only downloaded on request
+            if not em.get("body_loaded", True):
+                if st.button("📄 Load full message" if em.get("body") else "📄 Load message",
+                             key=f"{tab_id}_load_{mid}", use_container_width=True,
+                             help="Download the full email (only a preview was fetched)"):
+                    _load_body(mid, em, email_addr, app_pass)
 
             # ── Original Email body ────────────────────────────────────────────
-            body_txt = _strip_html((em.get("body") or "").strip())
+            body_txt = (em.get("body") or "").strip()   # converted to plain text at parse time
 
             # Track read state — use persistent store via email ID
-            read_key   = f"read_{idx}"
-            email_id   = em.get("id", "")
+            read_key   = f"read_{mid}"
+            email_id   = read_identity(em)
             already_read = st.session_state.get(read_key, False)
 
             if body_txt:
@@ -632,12 +1010,13 @@ def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str
                 )
                 # Single newline → <br>, blank line → small spacer
                 body_safe = body_safe.replace("\n\n", "<br>").replace("\n", "<br>")
+                preview_note = "" if em.get("body_loaded", True) else " · PREVIEW"
 
                 st.markdown(f"""
                 <div style='margin-bottom:1rem;'>
                     <div style='font-family:"Outfit",sans-serif; font-size:0.60rem; font-weight:800;
                                 color:var(--t3); text-transform:uppercase; letter-spacing:0.12em;
-                                margin-bottom:0.5rem;'>📧 ORIGINAL EMAIL</div>
+                                margin-bottom:0.5rem;'>📧 ORIGINAL EMAIL{preview_note}</div>
                     <div style='background:var(--bg3); border:1px solid var(--b1);
                                 border-left:3px solid var(--b2); border-radius:10px;
                                 padding:0.75rem 1.1rem;
@@ -673,7 +1052,17 @@ def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str
             </div>
             """, unsafe_allow_html=True)
 
+            # Manual corrections train the on-device classifier
+            cat_key = f"{tab_id}_cat_{mid}"
+            st.selectbox(
+                "Category", CATEGORIES, index=CATEGORIES.index(cat) if cat in CATEGORIES else 3,
+                key=cat_key, on_change=_recategorise, args=(mid, em, email_addr, cat_key),
+                help="Wrong category? Pick the right one — the local classifier learns from it.",
+            )
+
             # ── Attachments ────────────────────────────────────────────────────
+            # Descriptors only (section/filename/size) — bytes are fetched per part on
+            # demand, so this works for headers-first cards before the body loads too
             if atts:
                 # Split into images (render inline) and files (download cards)
                 img_atts  = [a for a in atts if a["content_type"].startswith("image/")]
@@ -687,6 +1076,16 @@ def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str
                                 margin-bottom:0.65rem;'>🖼️ IMAGES</div>
                     """, unsafe_allow_html=True)
 
+                    # Image bytes are only downloaded once the user asks to see them
+                    show_key = f"show_imgs_{mid}"
+                    if not st.session_state.get(show_key):
+                        total = format_size(sum(a["size"] for a in img_atts))
+                        if st.button(f"🖼️ Show {len(img_atts)} image{'s' if len(img_atts) != 1 else ''} ({total})",
+                                     key=f"{tab_id}_showimg_{mid}"):
+                            st.session_state[show_key] = True
+                            st.rerun()
+                        img_atts = []
+
                     # Show up to 3 images per row
                     for row_start in range(0, len(img_atts), 3):
                         row = img_atts[row_start:row_start + 3]
@@ -699,8 +1098,9 @@ def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str
 
                                 # Render the image itself
                                 try:
+                                    data = _attachment_bytes(em, att, email_addr, app_pass)
                                     st.image(
-                                        att["data"],
+                                        data,
                                         caption=None,
                                         use_container_width=True,
                                     )
@@ -723,14 +1123,16 @@ def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str
                                 </div>
                                 """, unsafe_allow_html=True)
 
-                                st.download_button(
-                                    "⬇ Download",
-                                    data=att["data"],
-                                    file_name=att["filename"],
-                                    mime=att["content_type"],
-                                    key=f"{tab_id}_dl_{idx}_img_{row_start + ci}",
-                                    use_container_width=True,
-                                )
+                                cached = _cached_attachment(em, att)
+                                if cached is not None:
+                                    st.download_button(
+                                        "⬇ Download",
+                                        data=cached,
+                                        file_name=att["filename"],
+                                        mime=att["content_type"],
+                                        key=f"{tab_id}_dl_{mid}_img_{row_start + ci}",
+                                        use_container_width=True,
+                                    )
 
                 # ── Non-image file attachments ─────────────────────────────────
                 if file_atts:
@@ -767,16 +1169,26 @@ def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str
                                             font-family:"JetBrains Mono",monospace;'>{size}</div>
                             </div>
                             """, unsafe_allow_html=True)
-                            st.download_button(
-                                "⬇ Download", data=att["data"],
-                                file_name=att["filename"], mime=att["content_type"],
-                                key=f"{tab_id}_dl_{idx}_{ai}",
-                                use_container_width=True,
-                            )
+                            cached = _cached_attachment(em, att)
+                            if cached is not None:
+                                st.download_button(
+                                    "💾 Save", data=cached,
+                                    file_name=att["filename"], mime=att["content_type"],
+                                    key=f"{tab_id}_dl_{mid}_{ai}",
+                                    use_container_width=True,
+                                )
+                            elif st.button("⬇ Download", key=f"{tab_id}_getatt_{mid}_{ai}",
+                                           use_container_width=True):
+                                with st.spinner("Downloading…"):
+                                    try:
+                                        _attachment_bytes(em, att, email_addr, app_pass)
+                                        st.rerun()
+                                    except Exception:
+                                        st.error("Couldn't download this attachment. Please try again.")
 
             # ── Draft Reply — highlighted violet, single editable area ─────────
-            draft_widget_key = f"{tab_id}_draft_{idx}"
-            draft_val = st.session_state.drafts.get(idx, "")
+            draft_widget_key = f"{tab_id}_draft_{mid}"
+            draft_val = st.session_state.drafts.get(mid, "")
 
             st.markdown("""
             <div style='background:linear-gradient(135deg, rgba(155,109,255,0.09) 0%, rgba(155,109,255,0.03) 100%);
@@ -795,6 +1207,14 @@ def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str
             </div>
             """, unsafe_allow_html=True)
 
+            # Drafts are generated on request, not for every fetched email
+            if not draft_val and em.get("body_loaded", True):
+                if st.button("✦ Write AI draft", key=f"{tab_id}_gen_{mid}",
+                             help="Generate a reply draft for this email"):
+                    _generate_draft(mid, em, email_addr, draft_widget_key, st.empty())
+
+            # Regenerated drafts stream here, above the reply box they replace
+            draft_stream = st.empty()
             edited = st.text_area(
                 "reply",
                 value=draft_val,
@@ -803,13 +1223,13 @@ def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str
                 label_visibility="collapsed",
                 placeholder="Your AI-generated reply will appear here. Edit freely before sending.",
             )
-            st.session_state.drafts[idx] = edited
+            st.session_state.drafts[mid] = edited
 
             # Attachment uploader — styled
             reply_files = st.file_uploader(
                 "📎 Attach files to reply",
                 accept_multiple_files=True,
-                key=f"{tab_id}_reply_att_{idx}_{st.session_state.reply_att_gen.get(idx, 0)}",
+                key=f"{tab_id}_reply_att_{mid}_{st.session_state.reply_att_gen.get(mid, 0)}",
             )
 
             if reply_files:
@@ -877,20 +1297,13 @@ def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str
             st.markdown("<div style='height:0.4rem'></div>", unsafe_allow_html=True)
             b1, b2, b3, b4 = st.columns(4)
             with b1:
-                if st.button("🔄", key=f"{tab_id}_regen_{idx}", help="Regenerate draft"):
-                    with st.spinner("Regenerating…"):
-                        result = ai_analyze_email(em["subject"], em["body"], regenerate=True)
-                        new_draft = result["draft"]
-                    # Delete widget key so Streamlit re-renders with new value
-                    st.session_state.drafts[idx] = new_draft
-                    if draft_widget_key in st.session_state:
-                        del st.session_state[draft_widget_key]
-                    st.rerun()
+                if st.button("🔄", key=f"{tab_id}_regen_{mid}", help="Regenerate draft"):
+                    _generate_draft(mid, em, email_addr, draft_widget_key, draft_stream, regenerate=True)
             with b2:
-                already_sent = st.session_state.sent_flags.get(idx, False)
+                already_sent = st.session_state.sent_flags.get(mid, False)
                 if st.button(
                     "✅" if already_sent else "📤",
-                    key=f"{tab_id}_send_{idx}",
+                    key=f"{tab_id}_send_{mid}",
                     disabled=already_sent,
                     help="Send reply" if not already_sent else "Already sent",
                 ):
@@ -899,40 +1312,36 @@ def _render_card(tab_id: str, idx: int, em: dict, email_addr: str, app_pass: str
                     if oversized:
                         st.error(f"Attachment(s) exceed the 25 MB limit: {', '.join(oversized)}")
                     else:
-                        try:
-                            send_email(
-                                from_addr=email_addr, app_password=app_pass,
-                                to_addr=em["from"],
-                                subject=f"Re: {em['subject']}",
-                                body=st.session_state.drafts[idx],
-                                attachments=reply_files if reply_files else None,
-                            )
-                            st.session_state.sent_flags[idx] = True
-                            st.session_state.reply_att_gen[idx] = st.session_state.reply_att_gen.get(idx, 0) + 1
-                            st.session_state.inbox_reply_sent_msg = "✅ Reply sent!"
-                            st.rerun()
-                        except Exception as e:
-                            msg = str(e).lower()
-                            if "size" in msg or "large" in msg or "too big" in msg:
-                                st.error(f"Failed to send: {e}")
-                            elif "auth" in msg or "login" in msg or "password" in msg:
-                                st.error("Failed to send: Authentication error. Please reconnect your account.")
-                            else:
-                                st.error("Failed to send reply. Please check your connection and try again.")
+                        # Snapshot uploads now — the widget is reset before the job runs
+                        atts = [
+                            {"data": f.getvalue(), "filename": f.name,
+                             "content_type": f.type or "application/octet-stream"}
+                            for f in reply_files or []
+                        ]
+                        st.session_state.jobs.append(jobs.submit(
+                            "send", email_addr, app_pass, label=em["subject"], ref=mid,
+                            to_addr=em["from"], subject=f"Re: {em['subject']}",
+                            body=st.session_state.drafts[mid], attachments=atts or None,
+                        ))
+                        # Optimistic — rolled back by _collect_jobs if the send fails
+                        st.session_state.sent_flags[mid] = True
+                        st.session_state.reply_att_gen[mid] = st.session_state.reply_att_gen.get(mid, 0) + 1
+                        st.rerun()
             with b3:
-                if st.button("✍️", key=f"{tab_id}_fwd_{idx}", help="Open in Compose"):
+                if st.button("✍️", key=f"{tab_id}_fwd_{mid}", help="Open in Compose"):
                     st.session_state.compose_to   = em["from"]
                     st.session_state.compose_sub  = f"Re: {em['subject']}"
-                    st.session_state.compose_body = st.session_state.drafts[idx]
+                    st.session_state.compose_body = st.session_state.drafts[mid]
                     st.session_state.current_page = "compose"
                     st.rerun()
             with b4:
-                if st.button("🗑️ Delete", key=f"{tab_id}_del_{idx}", help="Delete this email",
+                if st.button("🗑️ Delete", key=f"{tab_id}_del_{mid}", help="Delete this email",
                              use_container_width=True):
-                    with st.spinner("Deleting…"):
-                        delete_email(email_addr, app_pass, em["id"])
-                    st.session_state.deleted_indices.add(idx)
-                    _ALL_TAB_IDS_CARD = ["all", "imp", "pro", "upd", "oth"]
-                    for _tid in _ALL_TAB_IDS_CARD:
-                        st.session_state.pop(f"{_tid}_chk_{idx}", None)
+                    st.session_state.jobs.append(jobs.submit(
+                        "delete", email_addr, app_pass, label=em["subject"], ref=mid, uid=em["uid"],
+                    ))
+                    # Optimistic — _collect_jobs puts the card back if Gmail refuses
+                    st.session_state.deleted_ids.add(mid)
+                    for _tid in _ALL_TAB_IDS:
+                        st.session_state.pop(f"{_tid}_chk_{mid}", None)
                     st.rerun()
@@ -1,18 +1,6 @@
 import os
 import streamlit as st
-import google.generativeai as genai
-
-
-_GEMINI_PREFERRED = [
-    "gemini-2.0-flash-lite",
-    "gemini-2.0-flash",
-    "gemini-1.5-flash",
-    "gemini-1.5-flash-latest",
-    "gemini-1.5-flash-8b",
-    "gemini-1.5-pro",
-    "gemini-pro",
-    "gemini-2.5-flash",
-]
+from utils import ai_cache, classifier, compact, imap_pool, model_catalog, model_scheduler, rules, watcher
 
 
 def render_sidebar() -> tuple[str, str]:
@@ -76,29 +64,28 @@ def render_sidebar() -> tuple[str, str]:
         if st.button("⚡ Connect Account", key="btn_connect"):
             if email_addr and app_pass and gemini_key:
                 try:
+                    # Other credentials than last time: stop watching with the old ones
+                    old_addr = st.session_state.get("email_addr")
+                    old_pass = st.session_state.get("app_pass")
+                    if old_addr and (old_addr, old_pass) != (email_addr, app_pass):
+                        watcher.stop(old_addr)
+                        imap_pool.close_account(old_addr, old_pass)
+
                     st.session_state.model          = None
                     st.session_state.credentials_ok = False
-                    genai.configure(api_key=gemini_key)
-
-                    available = {
-                        m.name.split("/")[-1]: m.name
-                        for m in genai.list_models()
-                        if "generateContent" in getattr(m, "supported_generation_methods", [])
-                        and "tts"       not in m.name.lower()
-                        and "vision"    not in m.name.lower()
-                        and "embedding" not in m.name.lower()
-                        and "aqa"       not in m.name.lower()
-                        and "preview"   not in m.name.lower()
-                    }
-
-                    ordered  = [n for n in _GEMINI_PREFERRED if n in available]
-                    ordered += [n for n in available if n not in ordered]
+
+                    # Cached per key for the whole process — only the first connect lists models
+                    ordered = model_catalog.models_for(gemini_key)
 
                     if not ordered:
                         st.error("No supported Gemini models found for this API key.")
                     else:
-                        chosen = ordered[0]
-                        st.session_state.model             = genai.GenerativeModel(chosen)
+                        # Skip models still cooling down from an earlier session
+                        key_id = model_scheduler.key_id(gemini_key)
+                        chosen = model_scheduler.pick(key_id, ordered) or ordered[0]
+                        model_catalog.bind(gemini_key, ordered)
+                        st.session_state.gemini_key_id     = key_id
+                        st.session_state.model             = model_catalog.handle(key_id, chosen)
                         st.session_state.model_fallbacks   = ordered
                         st.session_state.credentials_ok    = True
                         st.session_state.email_addr        = email_addr
@@ -180,4 +167,62 @@ def render_sidebar() -> tuple[str, str]:
                     </div>
                     """, unsafe_allow_html=True)
 
+            cache = ai_cache.stats()
+            if cache["hits"] or cache["misses"]:
+                st.markdown(f"""
+                <div style="padding:8px 1rem 3px; font-family:'JetBrains Mono',monospace;
+                            font-size:0.66rem; color:var(--t3);">
+                    AI cache · {cache["hits"]} hit{"s" if cache["hits"] != 1 else ""}
+                    / {cache["misses"]} miss{"es" if cache["misses"] != 1 else ""}
+                    ({cache["hit_rate"]:.0%})
+                </div>
+                """, unsafe_allow_html=True)
+
+            local = rules.stats()
+            if local["checked"]:
+                st.markdown(f"""
+                <div style="padding:0 1rem 3px; font-family:'JetBrains Mono',monospace;
+                            font-size:0.66rem; color:var(--t3);">
+                    Local rules · {local["skipped"]} of {local["checked"]} sorted
+                    without AI ({local["skip_rate"]:.0%})
+                </div>
+                """, unsafe_allow_html=True)
+
+            model = classifier.stats()
+            if model["trained"]:
+                state = "answering" if model["active"] else "learning"
+                st.markdown(f"""
+                <div style="padding:0 1rem 3px; font-family:'JetBrains Mono',monospace;
+                            font-size:0.66rem; color:var(--t3);">
+                    Local model · {state} · {model["trained"]} labels
+                    · {model["agreement"]:.0%} agreement
+                </div>
+                """, unsafe_allow_html=True)
+
+            trimmed = compact.stats()
+            if trimmed["tokens_saved"]:
+                st.markdown(f"""
+                <div style="padding:0 1rem 3px; font-family:'JetBrains Mono',monospace;
+                            font-size:0.66rem; color:var(--t3);">
+                    Prompt compaction · {trimmed["tokens_saved"]:,} tokens saved
+                    (~{trimmed["avg_saved"]:.0f}/email)
+                </div>
+                """, unsafe_allow_html=True)
+
+            usage = [u for u in model_scheduler.status(st.session_state.get("gemini_key_id", ""),
+                                                       st.session_state.get("model_fallbacks", []))
+                     if u["requests"] or u["cooling_down"]]
+            if usage:
+                parts = " · ".join(
+                    f"{u['model'].replace('gemini-', '')} {u['requests']}/{u['limit']}"
+                    + (" ⏸" if u["cooling_down"] else "")
+                    for u in usage
+                )
+                st.markdown(f"""
+                <div style="padding:0 1rem 3px; font-family:'JetBrains Mono',monospace;
+                            font-size:0.66rem; color:var(--t3);">
+                    Gemini today · {parts}
+                </div>
+                """, unsafe_allow_html=True)
+
     return email_addr, app_pass
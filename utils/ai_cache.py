@@ -0,0 +1,113 @@
+"""
+Persistent AI analysis cache.
+
+Gemini output for an email is stored under a SHA-256 of the sanitised
+subject + body and the prompt version, so re-fetching an inbox that was
+already analysed costs no API calls. The model is not part of the key:
+model_scheduler rotates between models, and any of them answers the same
+prompt. The table is capped at
+_MAX_ENTRIES rows and evicts least-recently-used entries beyond that.
+
+Storage: .smartmail_ai_cache.sqlite3  (next to agent.py / working dir)
+"""
+from __future__ import annotations
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+_STORE_PATH  = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".smartmail_ai_cache.sqlite3")
+_MAX_ENTRIES = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    key        TEXT PRIMARY KEY,
+    category   TEXT,
+    summary    TEXT,
+    draft      TEXT,
+    created_at REAL,
+    last_used  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_last_used ON analyses (last_used);
+"""
+
+_initialised = False
+_stats_lock  = threading.Lock()
+_stats       = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialised
+    conn = sqlite3.connect(_STORE_PATH, timeout=10)
+    conn.row_factory = sqlite3.Row
+    if not _initialised:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _initialised = True
+    return conn
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += n
+
+
+def cache_key(subject: str, body: str, prompt_version: str) -> str:
+    """Content hash identifying one analysis request."""
+    h = hashlib.sha256()
+    for part in (prompt_version, subject, body):
+        h.update(part.encode("utf-8", errors="replace"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def get(key: str) -> dict | None:
+    """Cached {"category", "summary", "draft"} for this key, or None on a miss."""
+    try:
+        with _connect() as conn:
+            row = conn.execute(
+                "SELECT category, summary, draft FROM analyses WHERE key=?", (key,)
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE analyses SET last_used=? WHERE key=?", (time.time(), key))
+    except sqlite3.Error:
+        row = None
+    if row is None:
+        _count("misses")
+        return None
+    _count("hits")
+    return {"category": row["category"], "summary": row["summary"] or "", "draft": row["draft"] or ""}
+
+
+def put(key: str, result: dict) -> None:
+    """Store an analysis result, evicting the least recently used rows past the cap."""
+    now = time.time()
+    try:
+        with _connect() as conn:
+            conn.execute(
+                """INSERT INTO analyses (key, category, summary, draft, created_at, last_used)
+                   VALUES (?,?,?,?,?,?)
+                   ON CONFLICT (key) DO UPDATE SET category=excluded.category,
+                       summary=excluded.summary, draft=excluded.draft, last_used=excluded.last_used""",
+                (key, result.get("category"), result.get("summary", ""), result.get("draft", ""), now, now),
+            )
+            over = conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0] - _MAX_ENTRIES
+            if over > 0:
+                conn.execute(
+                    "DELETE FROM analyses WHERE key IN "
+                    "(SELECT key FROM analyses ORDER BY last_used ASC LIMIT ?)",
+                    (over,),
+                )
+                _count("evictions", over)
+    except sqlite3.Error:
+        pass  # read-only filesystem — caching is best-effort
+
+
+def stats() -> dict:
+    """Process-wide hit/miss/eviction counters plus the hit rate."""
+    with _stats_lock:
+        out = dict(_stats)
+    total = out["hits"] + out["misses"]
+    out["hit_rate"] = out["hits"] / total if total else 0.0
+    return out
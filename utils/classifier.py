@@ -0,0 +1,261 @@
+"""
+On-device category classifier.
+
+A multinomial naive Bayes model over hashed word features (sender domain,
+subject and the start of the body), trained incrementally from Gemini's
+categories and from manual corrections made in the inbox. Each AI label is
+first used as a test case — the model predicts, then learns — so the
+rolling agreement with Gemini is always known. Once that agreement is high
+enough, confident predictions replace the API call for categorisation.
+
+Prediction is a dict lookup per token — about 0.1 ms per email on CPU.
+
+Storage: .smartmail_classifier.json  (next to agent.py / working dir)
+
+Offline evaluation against the labels held in the message store:
+    python -m utils.classifier
+"""
+from __future__ import annotations
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from collections import deque
+from email.utils import parseaddr
+
+_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".smartmail_classifier.json")
+
+# Same order as utils.ai_utils.CATEGORIES (kept here so the harness runs without Streamlit)
+CATEGORIES = ["Important", "Promotions", "Updates", "Others"]
+
+_N_BUCKETS      = 1 << 18
+_BODY_CHARS     = 2000
+_ALPHA          = 0.5     # Laplace smoothing
+_USER_WEIGHT    = 3       # a manual correction counts as this many AI labels
+_WINDOW         = 200     # rolling agreement window (AI labels)
+_MIN_TRAINED    = 60      # labels seen before the model may answer on its own
+_MIN_AGREEMENT  = 0.9     # rolling agreement with Gemini required to take over
+_MIN_PROB       = 0.95    # per-email posterior required to skip the API
+
+_WORD = re.compile(r"[a-z][a-z0-9'$%]{1,24}")
+
+
+def _features(em: dict) -> list[int]:
+    """Hashed bucket ids; subject and sender tokens are namespaced so they weigh separately."""
+    _, addr = parseaddr(em.get("from", ""))
+    domain  = addr.rsplit("@", 1)[-1].lower() if "@" in addr else ""
+    tokens  = [f"d:{domain}"] if domain else []
+    tokens += ["s:" + w for w in _WORD.findall((em.get("subject") or "").lower())]
+    tokens += _WORD.findall((em.get("body") or "")[:_BODY_CHARS].lower())
+    return [zlib.crc32(t.encode()) % _N_BUCKETS for t in tokens]
+
+
+class NaiveBayes:
+    """Hashed-feature multinomial naive Bayes with sparse per-category counts."""
+
+    def __init__(self, data: dict | None = None):
+        data = data or {}
+        self.docs     = {c: data.get("docs", {}).get(c, 0) for c in CATEGORIES}
+        self.totals   = {c: data.get("totals", {}).get(c, 0) for c in CATEGORIES}
+        self.counts   = {c: {int(k): v for k, v in data.get("counts", {}).get(c, {}).items()} for c in CATEGORIES}
+        self.vocab    = set(int(k) for k in data.get("vocab", []))
+        self.agree    = deque(data.get("agree", []), maxlen=_WINDOW)
+
+    def to_dict(self) -> dict:
+        return {
+            "docs":   self.docs,
+            "totals": self.totals,
+            "counts": {c: {str(k): v for k, v in self.counts[c].items()} for c in CATEGORIES},
+            "vocab":  sorted(self.vocab),
+            "agree":  list(self.agree),
+        }
+
+    @property
+    def n_trained(self) -> int:
+        return sum(self.docs.values())
+
+    @property
+    def agreement(self) -> float:
+        return sum(self.agree) / len(self.agree) if self.agree else 0.0
+
+    def learn(self, em: dict, category: str, weight: int = 1) -> None:
+        if category not in self.docs:
+            return
+        feats = _features(em)
+        self.docs[category]   += weight
+        self.totals[category] += weight * len(feats)
+        counts = self.counts[category]
+        for f in feats:
+            counts[f] = counts.get(f, 0) + weight
+        self.vocab.update(feats)
+
+    def predict(self, em: dict) -> tuple[str, float]:
+        """(most likely category, posterior probability); ("Others", 0.0) when untrained."""
+        n = self.n_trained
+        if not n:
+            return "Others", 0.0
+        feats = _features(em)
+        v     = len(self.vocab) or 1
+        scores = {}
+        for c in CATEGORIES:
+            counts = self.counts[c]
+            denom  = math.log(self.totals[c] + _ALPHA * v)
+            score  = math.log((self.docs[c] + 1) / (n + len(CATEGORIES)))
+            for f in feats:
+                score += math.log(counts.get(f, 0) + _ALPHA) - denom
+            scores[c] = score
+        best = max(scores, key=scores.get)
+        top  = scores[best]
+        norm = sum(math.exp(s - top) for s in scores.values())
+        return best, 1.0 / norm
+
+
+# ── Process-wide model ─────────────────────────────────────────────────────────
+
+_lock   = threading.Lock()
+_model: NaiveBayes | None = None
+_dirty  = False
+
+
+def _load() -> NaiveBayes:
+    global _model
+    if _model is None:
+        try:
+            with open(_STORE_PATH, "r", encoding="utf-8") as f:
+                _model = NaiveBayes(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError, TypeError, ValueError):
+            _model = NaiveBayes()
+    return _model
+
+
+def save() -> None:
+    """Write the model to disk if anything was learnt since the last save."""
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        data   = _load().to_dict()
+        _dirty = False
+    try:
+        tmp = _STORE_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, _STORE_PATH)
+    except OSError:
+        pass  # read-only filesystem — the model lives for this process only
+
+
+def learn(em: dict, category: str, source: str = "ai") -> None:
+    """
+    Train on one labelled email. AI labels are scored against the current
+    prediction first, which keeps the rolling agreement figure honest.
+    """
+    global _dirty
+    with _lock:
+        model = _load()
+        if source == "ai":
+            predicted, _ = model.predict(em)
+            if model.n_trained:
+                model.agree.append(int(predicted == category))
+        model.learn(em, category, weight=_USER_WEIGHT if source == "user" else 1)
+        _dirty = True
+
+
+def classify(em: dict) -> dict | None:
+    """
+    Category for `em` from the local model, or None when the model is not
+    trusted yet or not confident about this email (ask Gemini instead).
+    """
+    with _lock:
+        model = _load()
+        if model.n_trained < _MIN_TRAINED or len(model.agree) < _WINDOW // 4 or model.agreement < _MIN_AGREEMENT:
+            return None
+        category, prob = model.predict(em)
+    if prob < _MIN_PROB:
+        return None
+    return {"category": category, "confidence": prob}
+
+
+def stats() -> dict:
+    """Labels learnt, rolling agreement with Gemini and whether the model is answering."""
+    with _lock:
+        model = _load()
+        n, agreement, window = model.n_trained, model.agreement, len(model.agree)
+    return {
+        "trained":   n,
+        "agreement": agreement,
+        "window":    window,
+        "active":    n >= _MIN_TRAINED and window >= _WINDOW // 4 and agreement >= _MIN_AGREEMENT,
+    }
+
+
+# ── Offline evaluation ─────────────────────────────────────────────────────────
+
+def evaluate(rows: list[dict], train_frac: float = 0.8) -> dict:
+    """
+    Train a fresh model on the oldest `train_frac` of `rows` and measure
+    agreement with their stored labels on the rest. Returns overall agreement,
+    agreement/coverage above the confidence gate, a confusion matrix and the
+    mean prediction time.
+    """
+    import time
+
+    split = int(len(rows) * train_frac)
+    train, test = rows[:split], rows[split:]
+    model = NaiveBayes()
+    for r in train:
+        model.learn(r, r["category"], weight=_USER_WEIGHT if r.get("source") == "user" else 1)
+
+    confusion = {c: {p: 0 for p in CATEGORIES} for c in CATEGORIES}
+    hits = confident = confident_hits = 0
+    start = time.perf_counter()
+    for r in test:
+        pred, prob = model.predict(r)
+        confusion.setdefault(r["category"], {p: 0 for p in CATEGORIES})[pred] += 1
+        hits += pred == r["category"]
+        if prob >= _MIN_PROB:
+            confident      += 1
+            confident_hits += pred == r["category"]
+    elapsed = time.perf_counter() - start
+
+    return {
+        "train":                len(train),
+        "test":                 len(test),
+        "agreement":            hits / len(test) if test else 0.0,
+        "coverage":             confident / len(test) if test else 0.0,
+        "confident_agreement":  confident_hits / confident if confident else 0.0,
+        "confusion":            confusion,
+        "us_per_email":         elapsed / len(test) * 1e6 if test else 0.0,
+    }
+
+
+def _main() -> None:
+    import argparse
+    from utils import store
+
+    parser = argparse.ArgumentParser(description="Evaluate the local classifier against stored Gemini labels.")
+    parser.add_argument("--train-frac", type=float, default=0.8)
+    parser.add_argument("--include-user", action="store_true", help="also train/test on manual corrections")
+    args = parser.parse_args()
+
+    sources = ("ai", "user") if args.include_user else ("ai",)
+    rows = store.labelled_messages(sources)
+    if len(rows) < 10:
+        print(f"Only {len(rows)} labelled emails in the store — fetch and analyse more mail first.")
+        return
+    res = evaluate(rows, args.train_frac)
+    print(f"train {res['train']}  test {res['test']}")
+    print(f"agreement with Gemini      {res['agreement']:.1%}")
+    print(f"coverage at p≥{_MIN_PROB:<4}        {res['coverage']:.1%}  "
+          f"(agreement {res['confident_agreement']:.1%})")
+    print(f"prediction time            {res['us_per_email']:.0f} µs/email")
+    print("\nconfusion (rows = Gemini, cols = local)")
+    print(" " * 12 + "".join(f"{c[:10]:>11}" for c in CATEGORIES))
+    for c, row in res["confusion"].items():
+        print(f"{c[:10]:<12}" + "".join(f"{row.get(p, 0):>11}" for p in CATEGORIES))
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,113 @@
+"""
+Prompt compaction for email bodies.
+
+Before an email is truncated into a Gemini prompt, compact_body() drops the
+parts that repeat or carry no new content: ">"-quoted history, everything
+after an "On … wrote:" / "-----Original Message-----" reply header,
+signatures and trailing unsubscribe/legal footers. The truncation budget
+then goes to what the sender actually wrote.
+
+One pass over the lines with precompiled patterns — no parsing libraries.
+"""
+from __future__ import annotations
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+# ~4 characters per token for English text (same estimate as ai_utils)
+_CHARS_PER_TOKEN = 4
+
+_REPLY_HEADER  = re.compile(r"^\s*On\b.{0,300}\bwrote:\s*$", re.I)
+_REPLY_START   = re.compile(r"^\s*On\b.{0,300}$", re.I)
+_WROTE_END     = re.compile(r"^.{0,200}\bwrote:\s*$", re.I)
+_ORIGINAL_MSG  = re.compile(r"^\s*-{2,}\s*(Original Message|Forwarded by)\b.*-*\s*$", re.I)
+_OUTLOOK_RULE  = re.compile(r"^\s*_{20,}\s*$")
+_OUTLOOK_FROM  = re.compile(r"^\s*\*?From:\*?\s+\S", re.I)
+_OUTLOOK_META  = re.compile(r"^\s*\*?(Sent|Date|To|Subject):\*?\s", re.I)
+_SIG_DELIM     = re.compile(r"^--\s?$")
+_MOBILE_SIG    = re.compile(r"^\s*(Sent from my \w+|Sent from (Mail|Outlook|Yahoo Mail) for|Get Outlook for)\b", re.I)
+_FOOTER        = re.compile(
+    r"unsubscribe|opt[- ]out|manage (your )?(email )?(preferences|subscriptions)|"
+    r"you(?:'re| are) receiving this|this (e-?mail|message) (and any attachments )?(is|are|was|may be) "
+    r"(intended|confidential|privileged)|privacy policy|view (it|this email) in your browser|"
+    r"all rights reserved|©|\(c\) \d{4}",
+    re.I,
+)
+
+_stats_lock = threading.Lock()
+_stats      = {"emails": 0, "tokens_saved": 0}
+# The same body is compacted again for cache lookups, fallbacks and drafts — count it once
+_counted: OrderedDict[str, None] = OrderedDict()
+_MAX_COUNTED = 10_000
+
+
+def _is_outlook_header(lines: list[str], i: int) -> bool:
+    """A "From: …" line followed by Sent/Date/To/Subject lines is a quoted Outlook header."""
+    if not _OUTLOOK_FROM.match(lines[i]):
+        return False
+    meta = sum(1 for ln in lines[i + 1:i + 5] if _OUTLOOK_META.match(ln))
+    return meta >= 2
+
+
+def _drop_footer(lines: list[str]) -> list[str]:
+    """Remove trailing paragraphs that are unsubscribe / legal boilerplate."""
+    end = len(lines)
+    while end > 0:
+        while end > 0 and not lines[end - 1].strip():
+            end -= 1
+        start = end
+        while start > 0 and lines[start - 1].strip():
+            start -= 1
+        para = " ".join(lines[start:end])
+        # Short boilerplate paragraphs only — a long paragraph mentioning "unsubscribe" may be content
+        if start == end or len(para) > 600 or not _FOOTER.search(para):
+            break
+        end = start
+    return lines[:end]
+
+
+def compact_body(body: str) -> tuple[str, int]:
+    """
+    Strip quoted replies, reply headers, signatures and footers from `body`.
+    Returns (compacted text, estimated tokens saved). If nothing would be
+    left — an email that is only a quote — the original text is returned.
+    """
+    if not body:
+        return "", 0
+    lines = body.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    kept: list[str] = []
+    for i, line in enumerate(lines):
+        if (_REPLY_HEADER.match(line)
+                or (_REPLY_START.match(line) and i + 1 < len(lines) and _WROTE_END.match(lines[i + 1]))
+                or _ORIGINAL_MSG.match(line)
+                or _OUTLOOK_RULE.match(line)
+                or _is_outlook_header(lines, i)
+                or _SIG_DELIM.match(line)):
+            break                     # everything below is history or signature
+        if line.lstrip().startswith(">") or _MOBILE_SIG.match(line):
+            continue
+        kept.append(line.rstrip())
+    kept = _drop_footer(kept)
+
+    text = re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip()
+    if not text:
+        text = body.strip()
+    saved = max(0, (len(body) - len(text)) // _CHARS_PER_TOKEN)
+    digest = hashlib.blake2b(body.encode("utf-8", errors="replace"), digest_size=12).hexdigest()
+    with _stats_lock:
+        if digest not in _counted:
+            _counted[digest] = None
+            if len(_counted) > _MAX_COUNTED:
+                _counted.popitem(last=False)
+            _stats["emails"]       += 1
+            _stats["tokens_saved"] += saved
+    return text, saved
+
+
+def stats() -> dict:
+    """Emails compacted this process, total tokens saved and the per-email average."""
+    with _stats_lock:
+        out = dict(_stats)
+    out["avg_saved"] = out["tokens_saved"] / out["emails"] if out["emails"] else 0.0
+    return out
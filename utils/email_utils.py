@@ -1,5 +1,7 @@
 import imaplib
 import email
+import base64
+import quopri
 import re
 import smtplib
 import mimetypes
@@ -9,6 +11,10 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 
+from utils import aimap, imap_pool, parse_pool
+from utils.charset import decode_text
+from utils.html_text import html_to_text
+
 # Maximum attachment size: 25 MB (Gmail hard limit is ~25 MB per message)
 _MAX_ATTACHMENT_BYTES = 25 * 1024 * 1024
 
@@ -49,50 +55,6 @@ def _sanitize_filename(filename: str) -> str:
     return filename or "attachment.bin"
 
 
-# ── HTML → clean plain text ────────────────────────────────────────────────────
-
-def _html_to_text(html: str) -> str:
-    """
-    Convert HTML email body to clean readable plain text.
-    Strips <style>, <script>, all tags, decodes entities, normalises whitespace.
-    """
-    # 1. Remove <style> blocks entirely (prevents CSS leaking into visible body)
-    html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.DOTALL | re.IGNORECASE)
-    # 2. Remove <script> blocks
-    html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.DOTALL | re.IGNORECASE)
-    # 3. Remove HTML comments
-    html = re.sub(r'<!--.*?-->', '', html, flags=re.DOTALL)
-    # 4. Block-level tags → newlines so paragraphs are preserved
-    for tag in ['p', 'br', 'div', 'tr', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote']:
-        html = re.sub(rf'</?{tag}[^>]*>', '\n', html, flags=re.IGNORECASE)
-    # 5. Strip ALL remaining tags
-    html = re.sub(r'<[^>]+>', '', html)
-    # 6. Decode HTML entities
-    html = html.replace('&nbsp;', ' ')
-    html = html.replace('&amp;',  '&')
-    html = html.replace('&lt;',   '<')
-    html = html.replace('&gt;',   '>')
-    html = html.replace('&quot;', '"')
-    html = html.replace('&#39;',  "'")
-    html = html.replace('&apos;', "'")
-    html = re.sub(r'&#(\d+);',            lambda m: chr(int(m.group(1))), html)
-    html = re.sub(r'&#x([0-9a-fA-F]+);', lambda m: chr(int(m.group(1), 16)), html)
-    # 7. Normalise whitespace
-    html = re.sub(r'[ \t]+',  ' ',    html)   # collapse spaces/tabs
-    html = re.sub(r' *\n *',  '\n',   html)   # trim around newlines
-    html = re.sub(r'\n{3,}',  '\n\n', html)   # max one blank line
-    return html.strip()
-
-
-def _decode_body(raw: bytes) -> str:
-    for enc in ("utf-8", "latin-1", "ascii", "windows-1252"):
-        try:
-            return raw.decode(enc)
-        except Exception:
-            continue
-    return raw.decode("utf-8", errors="replace")
-
-
 def _decode_header(value: str) -> str:
     if not value:
         return ""
@@ -100,30 +62,51 @@ def _decode_header(value: str) -> str:
     out = []
     for part, charset in parts:
         if isinstance(part, bytes):
-            out.append(part.decode(charset or "utf-8", errors="replace"))
+            out.append(decode_text(part, charset))
         else:
             out.append(part)
     return "".join(out)
 
 
-def _parse_message(msg) -> dict:
+def _iter_parts(msg, section: str = ""):
     """
-    Extract clean plain-text body and attachments.
+    Yield (imap_section, part) for every leaf MIME part, numbered the way
+    IMAP BODY[<section>] addresses them (RFC 3501 §6.4.5).
+    """
+    payload = msg.get_payload()
+    if msg.get_content_type() == "message/rfc822" and isinstance(payload, list) and payload:
+        # Encapsulated message — its parts are numbered under this one
+        inner = payload[0]
+        base  = section or "1"
+        yield from _iter_parts(inner, base if inner.is_multipart() else f"{base}.1")
+    elif msg.is_multipart():
+        for n, child in enumerate(payload, 1):
+            yield from _iter_parts(child, f"{section}.{n}" if section else str(n))
+    else:
+        yield section or "1", msg
+
+
+def _parse_message(msg, partial: bool = False) -> dict:
+    """
+    Extract clean plain-text body and attachment descriptors.
     Prefers text/plain; falls back to stripping text/html properly.
     Never lets raw HTML, CSS or JS leak into the body string.
+
+    Attachments are kept as metadata only (section, filename, size, type) —
+    their bytes are fetched on demand with fetch_attachment().
+
+    partial=True: `msg` was built from a truncated prefix (a preview), so
+    the last text part may end mid-character.
     """
     plain_body = ""
     html_body  = ""
     attachments = []
 
     if msg.is_multipart():
-        for part in msg.walk():
+        for section, part in _iter_parts(msg):
             ct = part.get_content_type()
             cd = str(part.get("Content-Disposition", ""))
 
-            if ct.startswith("multipart/"):
-                continue
-
             is_attachment = "attachment" in cd
             is_inline     = "inline" in cd
             has_cid       = part.get("Content-ID") is not None
@@ -133,14 +116,8 @@ def _parse_message(msg) -> dict:
             #   • explicitly marked attachment, OR
             #   • it's an inline image/binary (embedded photo, logo, etc.), OR
             #   • it's any non-text MIME type that isn't a container
-            is_binary = (
-                ct.startswith("image/")
-                or ct.startswith("audio/")
-                or ct.startswith("video/")
-                or ct.startswith("application/")
-            )
-
-            if is_attachment or (is_binary and (is_inline or has_cid or not ct.startswith("text/"))):
+            disposition = "attachment" if is_attachment else ("inline" if is_inline else "")
+            if _is_attachment_part(ct, disposition, has_cid):
                 raw = part.get_payload(decode=True)
                 if raw:
                     filename = part.get_filename()
@@ -150,108 +127,576 @@ def _parse_message(msg) -> dict:
                     attachments.append({
                         "filename":     filename,
                         "content_type": ct,
-                        "data":         raw,
+                        "data":         None,
                         "size":         len(raw),
                         # True for embedded images / inline content (not classic attachments)
                         "inline":       is_inline or has_cid,
                         "cid":          cid,
+                        "section":      section,
+                        "encoding":     str(part.get("Content-Transfer-Encoding", "7bit")).strip().lower(),
                     })
             elif ct == "text/plain" and not plain_body:
                 raw = part.get_payload(decode=True)
                 if raw:
-                    plain_body = _decode_body(raw)
+                    plain_body = decode_text(raw, part.get_content_charset(), partial)
             elif ct == "text/html" and not html_body:
                 raw = part.get_payload(decode=True)
                 if raw:
-                    html_body = _decode_body(raw)
+                    html_body = decode_text(raw, part.get_content_charset(), partial)
     else:
         ct  = msg.get_content_type()
         raw = msg.get_payload(decode=True)
         if raw:
             if ct == "text/html":
-                html_body  = _decode_body(raw)
+                html_body  = decode_text(raw, msg.get_content_charset(), partial)
             else:
-                plain_body = _decode_body(raw)
+                plain_body = decode_text(raw, msg.get_content_charset(), partial)
 
     # Prefer plain text; fall back to HTML-stripped
     if plain_body.strip():
         body = plain_body
     elif html_body.strip():
-        body = _html_to_text(html_body)
+        body = html_to_text(html_body)
     else:
         body = ""
 
     # Safety pass: if plain text still contains HTML tags, strip them too
     if body and re.search(r'<[a-zA-Z][^>]*>', body):
-        body = _html_to_text(body)
+        body = html_to_text(body)
 
     return {"body": body.strip(), "attachments": attachments}
 
 
 # ── Fetch ──────────────────────────────────────────────────────────────────────
 
-def fetch_emails(email_addr: str, app_password: str, limit: int = 20) -> list[dict]:
-    """Fetch unread emails via IMAP without marking them as read (BODY.PEEK)."""
-    import socket
-    socket.setdefaulttimeout(30)
+# Messages requested per UID FETCH round-trip
+_FETCH_BATCH_SIZE = 50
+# Concurrent connections for fetches of more than one batch (see utils/aimap.py)
+_PARALLEL_CONNECTIONS = 4
+
+_FETCH_START = re.compile(rb"^(\d+) \(")
+_FETCH_UID   = re.compile(rb"UID (\d+)")
+_LITERAL_KEY = re.compile(rb"((?:BODY|BINARY)\[[^\]]*\](?:<\d+>)?|RFC822(?:\.HEADER|\.TEXT)?) \{\d+\}$")
+_LITERAL_LEN = re.compile(rb"\{\d+\}$")
+
+
+def _uid_set(uids) -> str:
+    """
+    Compress UIDs into an IMAP sequence set so one command covers the batch.
+    e.g. [101, 102, 103, 110] → "101:103,110"
+    """
+    out = []
+    start = prev = None
+    for uid in sorted({int(u) for u in uids}):
+        if start is None:
+            start = prev = uid
+        elif uid == prev + 1:
+            prev = uid
+        else:
+            out.append(f"{start}:{prev}" if start != prev else str(start))
+            start = prev = uid
+    if start is not None:
+        out.append(f"{start}:{prev}" if start != prev else str(start))
+    return ",".join(out)
+
+
+def _split_fetch_response(data) -> list[dict]:
+    """
+    Group a raw imaplib FETCH response into one record per message.
+
+    imaplib returns a flat list mixing (header, literal) tuples and plain
+    bytes continuations, e.g.
+        [(b'3 (UID 101 BODY[] {342}', b'<raw>'), b')', (b'4 (UID 102 ...', ...), b')']
+    Each record is {"seq", "uid", "meta", "literals"} where "meta" holds the
+    non-literal bytes and "literals" maps item names (b'BODY[]') to payloads.
+    """
+    records = []
+    cur = None
+    for item in data or []:
+        if item is None:
+            continue
+        head = item[0] if isinstance(item, tuple) else item
+        m = _FETCH_START.match(head)
+        if m:
+            cur = {"seq": m.group(1), "uid": None, "meta": b"", "literals": {}}
+            records.append(cur)
+        if cur is None:
+            continue
+        if not isinstance(item, tuple):
+            cur["meta"] += head
+            continue
+        key = _LITERAL_KEY.search(head)
+        if key:
+            cur["meta"] += head
+            cur["literals"][key.group(1)] = item[1]
+        else:
+            # A literal inside a structure (e.g. a long filename in BODYSTRUCTURE)
+            # — splice it back in as a quoted string so the structure still parses
+            quoted = item[1].replace(b"\\", b"\\\\").replace(b'"', b'\\"')
+            cur["meta"] += _LITERAL_LEN.sub(b"", head) + b'"' + quoted + b'"'
+
+    for rec in records:
+        uid = _FETCH_UID.search(rec["meta"])
+        rec["uid"] = int(uid.group(1)) if uid else None
+    return records
+
+
+_SEXP_TOKEN = re.compile(rb'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()"]+')
+
 
-    mail = imaplib.IMAP4_SSL("imap.gmail.com")
+def _parse_sexp(data: bytes, start: int = 0):
+    """
+    Parse one parenthesised IMAP list (as used by BODYSTRUCTURE) into nested
+    Python lists. Quoted strings become str, NIL becomes None, other atoms str.
+    """
+    stack: list[list] = []
+    for m in _SEXP_TOKEN.finditer(data, start):
+        tok = m.group()
+        if tok == b"(":
+            stack.append([])
+            continue
+        if tok == b")":
+            if not stack:
+                break
+            done = stack.pop()
+            if not stack:
+                return done
+            stack[-1].append(done)
+            continue
+        if tok.startswith(b'"'):
+            val = re.sub(rb'\\(.)', rb"\1", tok[1:-1]).decode("utf-8", errors="replace")
+        elif tok.upper() == b"NIL":
+            val = None
+        else:
+            val = tok.decode("ascii", errors="replace")
+        if not stack:
+            return val
+        stack[-1].append(val)
+    return stack[0] if stack else None
+
+
+def _param_dict(params) -> dict:
+    if not isinstance(params, list):
+        return {}
+    return {str(k).lower(): v for k, v in zip(params[::2], params[1::2]) if k}
+
+
+def _walk_bodystructure(node, section: str = "") -> list[dict]:
+    """
+    Flatten a parsed BODYSTRUCTURE into leaf parts with their IMAP section
+    numbers ("1", "2.1", …), following RFC 3501 part numbering.
+    """
+    if not isinstance(node, list) or not node:
+        return []
+
+    # Multipart: (child)(child)… "subtype" …
+    if isinstance(node[0], list):
+        parts: list[dict] = []
+        n = 0
+        for child in node:
+            if not isinstance(child, list):
+                break
+            n += 1
+            parts += _walk_bodystructure(child, f"{section}.{n}" if section else str(n))
+        return parts
+
+    section  = section or "1"
+    ctype    = f"{node[0] or 'text'}/{node[1] or 'plain'}".lower()
+    ext      = 7
+    if ctype.startswith("text/"):
+        ext = 8
+    elif ctype == "message/rfc822":
+        # Encapsulated message: descend into its body, numbered under this part
+        inner = node[8] if len(node) > 8 else None
+        if isinstance(inner, list) and inner:
+            multipart = isinstance(inner[0], list)
+            return _walk_bodystructure(inner, section if multipart else f"{section}.1")
+        ext = 10
+
+    disp      = node[ext + 1] if len(node) > ext + 1 and isinstance(node[ext + 1], list) else None
+    disp_type = (disp[0] or "").lower() if disp else ""
+    disp_prm  = _param_dict(disp[1]) if disp and len(disp) > 1 else {}
+    params    = _param_dict(node[2])
     try:
-        mail.login(email_addr, app_password)
-        # readonly=True — we only read here, no writes needed
-        mail.select("inbox", readonly=True)
+        size = int(node[6] or 0)
+    except (TypeError, ValueError):
+        size = 0
+    encoding = (node[5] or "7bit").lower()
+    if encoding == "base64":
+        size = size * 3 // 4   # octets on the wire → approximate decoded size
+
+    return [{
+        "section":      section,
+        "content_type": ctype,
+        "charset":      params.get("charset"),
+        "encoding":     encoding,
+        "size":         size,
+        "filename":     disp_prm.get("filename") or params.get("name"),
+        "disposition":  disp_type,
+        "cid":          (node[3] or "").strip("<>"),
+    }]
+
+
+def _bodystructure_parts(meta: bytes) -> list[dict]:
+    pos = meta.find(b"BODYSTRUCTURE ")
+    if pos < 0:
+        return []
+    try:
+        return _walk_bodystructure(_parse_sexp(meta, pos + len(b"BODYSTRUCTURE ")))
+    except Exception:
+        return []
 
-        status, msgs = mail.search(None, "UNSEEN")
-        if status != "OK" or not msgs[0]:
-            return []
 
-        ids = msgs[0].split()[-limit:]
-        results = []
-        for eid in ids:
-            try:
-                _, data = mail.fetch(eid, "(BODY.PEEK[])")
-                for part in data:
-                    if isinstance(part, tuple):
-                        msg = email.message_from_bytes(part[1])
-                        parsed = _parse_message(msg)
-                        results.append({
-                            "id":          eid,
-                            "from":        _sanitize_header(_decode_header(msg.get("from", "Unknown"))),
-                            "subject":     _sanitize_header(_decode_header(msg.get("subject", "(No Subject)"))),
-                            "date":        _sanitize_header(msg.get("date", "")),
-                            "body":        parsed["body"],
-                            "attachments": parsed["attachments"],
-                        })
-            except Exception:
-                continue
+def _is_attachment_part(ct: str, disposition: str, has_cid: bool) -> bool:
+    """Same rule _parse_message applies: attachments, plus inline/embedded binaries."""
+    is_binary = (
+        ct.startswith("image/")
+        or ct.startswith("audio/")
+        or ct.startswith("video/")
+        or ct.startswith("application/")
+    )
+    is_inline = disposition == "inline"
+    return disposition == "attachment" or (
+        is_binary and (is_inline or has_cid or not ct.startswith("text/"))
+    )
 
-        return results
-    finally:
+
+def _structure_attachments(parts: list[dict]) -> list[dict]:
+    """Attachment summaries (no bytes) for the inbox list, from BODYSTRUCTURE parts."""
+    out = []
+    for p in parts:
+        ct = p["content_type"]
+        if ct.startswith("multipart/") or not _is_attachment_part(ct, p["disposition"], bool(p["cid"])):
+            continue
+        filename = p["filename"]
+        out.append({
+            "filename":     (_decode_header(filename) if filename
+                             else f"file{mimetypes.guess_extension(ct) or '.bin'}"),
+            "content_type": ct,
+            "data":         None,
+            "size":         p["size"],
+            "inline":       p["disposition"] == "inline" or bool(p["cid"]),
+            "cid":          p["cid"],
+            "section":      p["section"],
+            "encoding":     p["encoding"],
+        })
+    return out
+
+
+def _literal(rec: dict, prefix: bytes):
+    for key, val in rec["literals"].items():
+        if key.startswith(prefix):
+            return val
+    return None
+
+
+# Extra headers kept for the local rule pre-classifier (utils/rules.py)
+_RULE_HEADERS = ("List-Unsubscribe", "List-Id", "Precedence", "Auto-Submitted", "X-Auto-Response-Suppress")
+
+
+def _rule_headers(msg) -> dict:
+    return {
+        h.lower(): _sanitize_header(_decode_header(str(msg.get(h))))[:300]
+        for h in _RULE_HEADERS if msg.get(h) is not None
+    }
+
+
+def message_key(uidvalidity: int, uid: int) -> str:
+    """
+    Stable identity of a message within a mailbox: "<UIDVALIDITY>:<UID>".
+    Unlike sequence numbers it does not shift when other mail is expunged,
+    so session maps, caches and the store can be keyed by it.
+    """
+    return f"{int(uidvalidity or 0)}:{int(uid)}"
+
+
+def _message_record(uidvalidity: int, uid: int, raw: bytes) -> dict:
+    msg = email.message_from_bytes(raw)
+    parsed = _parse_message(msg)
+    return {
+        "id":          message_key(uidvalidity, uid),
+        "uid":         uid,
+        "uidvalidity": uidvalidity,
+        "from":        _sanitize_header(_decode_header(msg.get("from", "Unknown"))),
+        "subject":     _sanitize_header(_decode_header(msg.get("subject", "(No Subject)"))),
+        "date":        _sanitize_header(msg.get("date", "")),
+        "message_id":  _sanitize_header(msg.get("message-id", "")),
+        "headers":     _rule_headers(msg),
+        "body":        parsed["body"],
+        "attachments": parsed["attachments"],
+        "body_loaded": True,
+    }
+
+
+def _preview_text(raw_headers: bytes, prefix: bytes | None) -> str:
+    """
+    Plain text of the best text part from the first bytes of a message's
+    body (BODY[TEXT]<0.N>), parsed against the message's own Content-Type.
+    """
+    if not prefix:
+        return ""
+    if len(prefix) >= _PREVIEW_BYTES and b"\n" in prefix:
+        # Drop the cut-off last line: keeps base64 on a 4-char boundary and
+        # never leaves half a quoted-printable escape
+        prefix = prefix[:prefix.rfind(b"\n") + 1]
+    try:
+        msg = email.message_from_bytes((raw_headers or b"").rstrip(b"\r\n") + b"\r\n\r\n" + prefix)
+        return _parse_message(msg, partial=True)["body"]
+    except Exception:
+        return ""
+
+
+def _header_record(uidvalidity: int, uid: int, raw_headers: bytes, meta: bytes,
+                   prefix: bytes | None = None) -> dict:
+    """
+    Inbox-card record from header fields, BODYSTRUCTURE and a bounded
+    preview of the body — the full message is fetched when it is opened.
+    """
+    msg = email.message_from_bytes(raw_headers or b"")
+    return {
+        "id":          message_key(uidvalidity, uid),
+        "uid":         uid,
+        "uidvalidity": uidvalidity,
+        "from":        _sanitize_header(_decode_header(msg.get("from", "Unknown"))),
+        "subject":     _sanitize_header(_decode_header(msg.get("subject", "(No Subject)"))),
+        "date":        _sanitize_header(msg.get("date", "")),
+        "message_id":  _sanitize_header(msg.get("message-id", "")),
+        "headers":     _rule_headers(msg),
+        "body":        _preview_text(raw_headers, prefix),
+        "attachments": _structure_attachments(_bodystructure_parts(meta)),
+        "body_loaded": False,
+    }
+
+
+# Bytes of message text fetched for a card preview: covers the 1500 characters
+# the AI prompt reads plus the MIME part headers in front of them, so a
+# headers-first fetch costs the same per message whatever its size.
+_PREVIEW_BYTES = 4096
+
+_HEADER_ITEMS = (
+    "(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (FROM SUBJECT DATE MESSAGE-ID "
+    "CONTENT-TYPE CONTENT-TRANSFER-ENCODING " + " ".join(h.upper() for h in _RULE_HEADERS) + ")] "
+    f"BODY.PEEK[TEXT]<0.{_PREVIEW_BYTES}>)"
+)
+
+
+def fetch_uids(mail, uids, batch_size: int = _FETCH_BATCH_SIZE, headers_only: bool = False,
+               uidvalidity: int | None = None) -> list[dict]:
+    """
+    Fetch the given UIDs on an already-SELECTed connection, `batch_size` per
+    UID FETCH round-trip. Returns records sorted oldest → newest.
+
+    `uidvalidity` goes into each record's key; by default it is the value
+    the pool saw when it SELECTed the mailbox.
+    """
+    if uidvalidity is None:
+        uidvalidity = imap_pool.uidvalidity(mail)
+    items   = _HEADER_ITEMS if headers_only else "(UID BODY.PEEK[])"
+    batches = _batches(uids, batch_size)
+    pooled  = len(batches) >= parse_pool.MIN_JOBS
+    jobs    = []
+    for batch in batches:
+        try:
+            status, data = mail.uid("FETCH", batch, items)
+        except imaplib.IMAP4.abort:
+            raise
+        except Exception:
+            continue
+        if status == "OK":
+            # Parsed in a worker process while the next batch downloads
+            jobs.append(_parse_job((data, uidvalidity, headers_only), pooled))
+    results = parse_pool.gather(jobs)
+
+    # Servers may answer a UID set in any order — keep oldest → newest
+    results.sort(key=lambda em: em["uid"])
+    return results
+
+
+def fetch_uids_parallel(email_addr: str, app_password: str, uids, batch_size: int = _FETCH_BATCH_SIZE,
+                        headers_only: bool = False, mailbox: str = "inbox",
+                        uidvalidity: int | None = None, connections: int = _PARALLEL_CONNECTIONS,
+                        host: str = imap_pool.IMAP_HOST, port: int = 993, use_ssl: bool = True) -> list[dict]:
+    """
+    Like fetch_uids(), but the batches are spread over several concurrent
+    connections (utils/aimap.py) opened just for this fetch. Worth it once
+    there is more than one batch; records come back oldest → newest.
+    """
+    items   = _HEADER_ITEMS if headers_only else "(UID BODY.PEEK[])"
+    batches = _batches(uids, batch_size)
+    pooled  = len(batches) >= parse_pool.MIN_JOBS
+
+    def on_batch(_, selected_uv, data):
+        # Parsing starts in a worker process while the other connections keep downloading
+        return _parse_job((data, selected_uv if uidvalidity is None else uidvalidity, headers_only), pooled)
+
+    jobs = aimap.run(aimap.fetch_parallel(
+        host, port, email_addr, app_password, mailbox, batches, items,
+        connections=connections, use_ssl=use_ssl, on_batch=on_batch))
+    results = parse_pool.gather(jobs)
+    results.sort(key=lambda em: em["uid"])
+    return results
+
+
+def _batches(uids, batch_size: int) -> list[str]:
+    """Sorted UIDs cut into UID sets of `batch_size` messages each."""
+    uids = sorted(int(u) for u in uids)
+    batch_size = max(1, batch_size)
+    return [_uid_set(uids[i:i + batch_size]) for i in range(0, len(uids), batch_size)]
+
+
+def _parse_job(args: tuple, pooled: bool) -> tuple:
+    """A parse_pool.gather() job for fetch_records(*args) — in a worker if `pooled`, else inline later."""
+    return (parse_pool.submit(fetch_records, *args) if pooled else None), fetch_records, args
+
+
+def fetch_records(data, uidvalidity: int, headers_only: bool) -> list[dict]:
+    """
+    Inbox records from one UID FETCH response; unparseable messages are
+    skipped. Module-level so parse_pool workers can run it.
+    """
+    out = []
+    for rec in _split_fetch_response(data):
+        if rec["uid"] is None:
+            continue
         try:
-            mail.logout()
+            if headers_only:
+                out.append(_header_record(
+                    uidvalidity, rec["uid"], _literal(rec, b"BODY[HEADER"), rec["meta"],
+                    _literal(rec, b"BODY[TEXT]")))
+            else:
+                raw = rec["literals"].get(b"BODY[]")
+                if raw is not None:
+                    out.append(_message_record(uidvalidity, rec["uid"], raw))
         except Exception:
-            pass
+            continue
+    return out
+
+
+def search_unseen(mail, limit: int = 20) -> list[int]:
+    """UIDs of the newest `limit` unread messages on a SELECTed connection."""
+    status, msgs = mail.uid("SEARCH", None, "UNSEEN")
+    if status != "OK" or not msgs[0]:
+        return []
+    return sorted(int(u) for u in msgs[0].split())[-limit:]
+
+
+def fetch_emails(email_addr: str, app_password: str, limit: int = 20,
+                 batch_size: int = _FETCH_BATCH_SIZE, headers_only: bool = False) -> list[dict]:
+    """
+    Fetch unread emails via IMAP without marking them as read (BODY.PEEK).
+    Messages are pulled `batch_size` at a time with one UID FETCH per batch
+    instead of one round-trip per message; more than one batch is spread
+    over parallel connections.
+
+    headers_only=True fetches just From/Subject/Date/Message-ID,
+    BODYSTRUCTURE and the first _PREVIEW_BYTES of the body (partial fetch),
+    so each message costs a few KB however large it is. The preview is
+    enough to draw and analyse inbox cards; those records carry
+    body_loaded=False — load the rest with fetch_email_body().
+    """
+    with imap_pool.connection(email_addr, app_password, "inbox", readonly=True) as mail:
+        uids = search_unseen(mail, limit)
+        if len(uids) <= batch_size:
+            return fetch_uids(mail, uids, batch_size, headers_only)
+        uidvalidity = imap_pool.uidvalidity(mail)
+    # Several batches — fetch them over parallel connections instead of one after another
+    return fetch_uids_parallel(email_addr, app_password, uids, batch_size, headers_only,
+                               uidvalidity=uidvalidity)
+
+
+def fetch_email_body(email_addr: str, app_password: str, uid: int) -> dict:
+    """
+    Second phase of a headers_only fetch: download one full message by UID
+    and return its {"body", "attachments"}. Still BODY.PEEK — stays unread.
+    """
+    with imap_pool.connection(email_addr, app_password, "inbox", readonly=True) as mail:
+        status, data = mail.uid("FETCH", str(int(uid)), "(UID BODY.PEEK[])")
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"FETCH failed for UID {uid}")
+        for rec in _split_fetch_response(data):
+            raw = rec["literals"].get(b"BODY[]")
+            if raw is not None:
+                return _parse_message(email.message_from_bytes(raw))
+        raise imaplib.IMAP4.error(f"Message UID {uid} no longer exists")
+
+
+def _decode_transfer(raw: bytes, encoding: str) -> bytes:
+    """Undo a part's Content-Transfer-Encoding (BODY[<section>] returns it encoded)."""
+    encoding = (encoding or "").lower()
+    if encoding == "base64":
+        return base64.b64decode(re.sub(rb"[^A-Za-z0-9+/=]", b"", raw) or b"", validate=False)
+    if encoding == "quoted-printable":
+        return quopri.decodestring(raw)
+    return raw
+
+
+def fetch_attachment(email_addr: str, app_password: str, uid: int,
+                     section: str, encoding: str = "") -> bytes:
+    """
+    Download a single MIME part by UID + IMAP section (e.g. "2.1") with
+    BODY.PEEK[<section>] and return its decoded bytes.
+    """
+    if not re.fullmatch(r"\d+(\.\d+)*", section or ""):
+        raise ValueError(f"Invalid MIME section: {section!r}")
+
+    with imap_pool.connection(email_addr, app_password, "inbox", readonly=True) as mail:
+        status, data = mail.uid("FETCH", str(int(uid)), f"(UID BODY.PEEK[{section}])")
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"FETCH failed for UID {uid}")
+        for rec in _split_fetch_response(data):
+            raw = rec["literals"].get(f"BODY[{section}]".encode())
+            if raw is not None:
+                return _decode_transfer(raw, encoding)
+        raise imaplib.IMAP4.error(f"Part {section} of UID {uid} not found")
 
 
 # ── Send ───────────────────────────────────────────────────────────────────────
 
-def delete_email(email_addr: str, app_password: str, email_id: bytes) -> bool:
-    """Permanently delete an email from Gmail by its IMAP ID."""
-    import socket
-    socket.setdefaulttimeout(20)
-    try:
-        mail = imaplib.IMAP4_SSL("imap.gmail.com")
-        mail.login(email_addr, app_password)
-        mail.select("inbox", readonly=False)
-        # Mark as deleted then expunge
-        mail.store(email_id, "+FLAGS", "\\Deleted")
-        mail.expunge()
-        mail.logout()
-        return True
-    except Exception:
-        return False
+_DELETE_BATCH = 500   # UIDs per STORE/EXPUNGE command — keeps command lines well under server limits
 
 
+def delete_emails(email_addr: str, app_password: str, uids) -> dict[int, bool]:
+    """
+    Permanently delete messages by UID: one UID STORE +FLAGS (\\Deleted) on
+    the whole UID set, then one UID EXPUNGE limited to that set (UIDPLUS) —
+    or a plain EXPUNGE on servers without it. UIDs do not shift as messages
+    are expunged, so the wrong message can never be hit.
+
+    Returns {uid: True if it was flagged and expunged}; UIDs the server
+    refused or that no longer exist come back False. Connection, login and
+    SELECT failures raise — nothing was attempted, so they are not per-UID.
+    """
+    uids    = sorted({int(u) for u in uids})
+    results = {uid: False for uid in uids}
+    if not uids:
+        return results
+    with imap_pool.connection(email_addr, app_password, "inbox", readonly=False) as mail:
+        uidplus = "UIDPLUS" in mail.capabilities
+        for i in range(0, len(uids), _DELETE_BATCH):
+            chunk = _uid_set(uids[i:i + _DELETE_BATCH])
+            try:
+                status, data = mail.uid("STORE", chunk, "+FLAGS", "(\\Deleted)")
+                if status != "OK":
+                    continue
+                # Untagged FETCH responses name exactly the UIDs that exist and were flagged
+                flagged = {rec["uid"] for rec in _split_fetch_response(data) if rec["uid"] is not None}
+                status, _ = mail.uid("EXPUNGE", chunk) if uidplus else mail.expunge()
+            except imaplib.IMAP4.abort:
+                raise
+            except imaplib.IMAP4.error:
+                continue   # BAD reply to this chunk — its UIDs stay False
+            if status == "OK":
+                for uid in flagged & results.keys():
+                    results[uid] = True
+    return results
+
+
+class SendNotAttempted(ConnectionError):
+    """
+    Connecting or logging in to SMTP failed, so the message was certainly
+    not sent and retrying cannot deliver it twice.
+    """
+
 
 def send_email(
     from_addr: str,
@@ -307,8 +752,18 @@ def send_email(
             msg.attach(part)
 
     recipients = [a.strip() for a in to_addr.split(",") if a.strip()]
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
+    server = None
+    try:
+        server = smtplib.SMTP_SSL("smtp.gmail.com", 465)
         server.login(from_addr, app_password)
+    except OSError as e:   # SMTPConnectError, SMTPServerDisconnected, socket errors, timeouts
+        if server is not None:
+            server.close()
+        if isinstance(e, smtplib.SMTPAuthenticationError):
+            raise
+        raise SendNotAttempted(str(e)) from e
+    # From here on the server may have accepted the message — never retry blindly
+    with server:
         server.sendmail(from_addr, recipients, msg.as_string())
 
 
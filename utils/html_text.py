@@ -0,0 +1,90 @@
+"""
+HTML → plain text for email bodies.
+
+A fixed handful of whole-document regex passes, each a single C-level
+sub(): comments and <style>/<script> blocks go first, block-level tags
+become line breaks, table cells spaces, other tags nothing; entities are
+then decoded and whitespace normalised (runs collapsed, blank lines capped
+at one). Layout tags leave a NUL behind until the inline-tag pass so a
+stray "<" can't swallow text past the next paragraph or cell. Only entity
+decoding calls back into Python, and each distinct entity is decoded once
+per process.
+
+Compared with the previous regex cascade by `python -m bench.html_text`.
+"""
+from __future__ import annotations
+import html as _html
+import re
+from functools import lru_cache
+
+_BLOCK_TAGS = frozenset({
+    "p", "br", "div", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote",
+    "table", "ul", "ol", "hr", "section", "article", "header", "footer",
+})
+
+
+def _one_of(words) -> str:
+    """
+    Case-insensitive alternation of `words` factored into a prefix tree.
+    re.I and a flat "p|br|div|…" make the engine retry every branch at each
+    "<"; sharing prefixes makes the block-tag pass ~1.6× faster.
+    """
+    by_first: dict[str, list[str]] = {}
+    for w in words:
+        by_first.setdefault(w[0], []).append(w[1:])
+    alts = []
+    for c, rests in sorted(by_first.items()):
+        head = f"[{c.lower()}{c.upper()}]" if c.isalpha() else re.escape(c)
+        longer = [r for r in rests if r]
+        if longer:
+            head += "(?:" + _one_of(longer) + ")" + ("?" if "" in rests else "")
+        alts.append(head)
+    return "|".join(alts)
+
+
+_SKIP   = re.compile(r"<(?:!--.*?(?:-->|\Z)|(style|script)\b[^>]*>.*?(?:</\1\s*>|\Z))", re.S | re.I)
+_LAYOUT = r"</?(?:" + _one_of(sorted(_BLOCK_TAGS | {"td", "th"})) + r")\b[^<>]*>"
+# Whitespace between two layout tags is source formatting ("</td>\n  <td>"), not text
+_GAPS   = re.compile(r">\s+(?=" + _LAYOUT + r")")
+_BLOCK  = re.compile(r"</?(?:" + _one_of(sorted(_BLOCK_TAGS)) + r")\b[^<>]*>")
+_CELL   = re.compile(r"</?[tT][dDhH]\b[^<>]*>")
+_TAG    = re.compile(r"</?[a-zA-Z][^>\0]*>|<[!?][^>\0]*>")   # \0 marks where a layout tag was
+_ENTITY = re.compile(r"&(?:#[0-9]+;?|#[xX][0-9a-fA-F]+;?|[^\t\n\f <&#;]{1,32};?)")   # html.unescape's own
+# Whitespace other than " " and "\n"; \xa0 (&nbsp;) is replaced separately — str.replace is far cheaper
+_SPACE  = re.compile(r"[\t\r\f\v\x1c-\x1f\x85\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]+")
+_RUNS   = re.compile(r"  +")
+_EDGES  = re.compile(r" \n ?|\n ")     # only newlines that actually have a space beside them
+_BLANKS = re.compile(r"\n\n\n+")
+
+
+@lru_cache(maxsize=1024)
+def _entity(ref: str) -> str:
+    return _html.unescape(ref)
+
+
+def _sub_entity(m: re.Match) -> str:
+    return _entity(m.group())
+
+
+def html_to_text(html: str) -> str:
+    """
+    Convert an HTML email body to readable plain text: drops style/script
+    blocks and comments, turns block tags into line breaks, decodes every
+    HTML entity and normalises whitespace.
+    """
+    if not html:
+        return ""
+    if "\0" in html:
+        html = html.replace("\0", "")
+    html = _SKIP.sub("", html)
+    html = _GAPS.sub(">", html)
+    html = _BLOCK.sub("\0\n", html)   # two block tags in a row leave a blank line
+    html = _CELL.sub("\0 ", html)     # table cells: keep them apart on one line
+    html = _TAG.sub("", html).replace("\0", "")
+    if "&" in html:
+        html = _ENTITY.sub(_sub_entity, html)
+    html = _SPACE.sub(" ", html.replace("\xa0", " "))
+    html = _RUNS.sub(" ", html)
+    html = _EDGES.sub("\n", html)
+    html = _BLANKS.sub("\n\n", html)
+    return html.strip()
@@ -0,0 +1,231 @@
+"""
+Process-wide IMAP connection pool.
+
+Opening an IMAP4_SSL connection costs a TLS handshake plus LOGIN; doing that
+for every fetch, body load, attachment and delete dominates small
+operations. Connections are kept per account (address + password hash) and
+lent out one borrower at a time, so the pool is safe to use from background
+threads:
+
+    with imap_pool.connection(email_addr, app_password, "inbox") as mail:
+        mail.uid("FETCH", ...)
+
+A connection idle for more than _NOOP_AFTER seconds is checked with NOOP
+before it is lent; one idle for more than _IDLE_TIMEOUT is logged out.
+The mailbox is re-SELECTed only when the borrower needs a different one
+(or write access on a read-only selection).
+"""
+from __future__ import annotations
+import hashlib
+import imaplib
+import threading
+import time
+from contextlib import contextmanager
+
+IMAP_HOST = "imap.gmail.com"
+
+_TIMEOUT         = 30       # socket timeout per connection (seconds)
+_MAX_PER_ACCOUNT = 4        # Gmail allows ~15 concurrent IMAP connections per account
+_NOOP_AFTER      = 60       # health-check connections idle longer than this
+_IDLE_TIMEOUT    = 5 * 60   # log out connections idle longer than this
+_WAIT_TIMEOUT    = 60       # how long a borrower waits for a free connection
+
+_lock   = threading.Condition()
+_idle:  dict[tuple[str, str], list] = {}   # account key → idle connections (most recent last)
+_count: dict[tuple[str, str], int]  = {}   # account key → open connections (idle + lent)
+_reaper: threading.Thread | None = None
+
+
+def _key(email_addr: str, app_password: str) -> tuple[str, str]:
+    return email_addr.lower(), hashlib.sha256(app_password.encode()).hexdigest()[:16]
+
+
+def _open(email_addr: str, app_password: str):
+    mail = imaplib.IMAP4_SSL(IMAP_HOST, timeout=_TIMEOUT)
+    try:
+        mail.login(email_addr, app_password)
+    except Exception:
+        _close(mail)
+        raise
+    mail.pool_selected = None      # (mailbox, readonly) currently selected
+    mail.pool_uidvalidity = 0      # UIDVALIDITY reported by that SELECT
+    mail.pool_last_used = time.monotonic()
+    return mail
+
+
+def _close(mail) -> None:
+    try:
+        mail.logout()
+    except Exception:
+        pass
+
+
+def _healthy(mail) -> bool:
+    if time.monotonic() - mail.pool_last_used < _NOOP_AFTER:
+        return True
+    try:
+        return mail.noop()[0] == "OK"
+    except Exception:
+        return False
+
+
+def _evict_idle() -> list:
+    """Pop connections idle past _IDLE_TIMEOUT (caller holds _lock); returns them for closing."""
+    now, stale = time.monotonic(), []
+    for key, conns in _idle.items():
+        keep = []
+        for mail in conns:
+            (stale if now - mail.pool_last_used > _IDLE_TIMEOUT else keep).append(mail)
+        _count[key] -= len(conns) - len(keep)
+        conns[:] = keep
+    return stale
+
+
+def _reap_forever() -> None:
+    while True:
+        time.sleep(_IDLE_TIMEOUT / 2)
+        with _lock:
+            stale = _evict_idle()
+            _lock.notify_all()
+        for mail in stale:
+            _close(mail)
+
+
+def _start_reaper() -> None:
+    global _reaper
+    if _reaper is None or not _reaper.is_alive():
+        _reaper = threading.Thread(target=_reap_forever, name="smartmail-imap-reaper", daemon=True)
+        _reaper.start()
+
+
+def _acquire(email_addr: str, app_password: str):
+    key = _key(email_addr, app_password)
+    deadline = time.monotonic() + _WAIT_TIMEOUT
+    while True:
+        with _lock:
+            _start_reaper()
+            stale = _evict_idle()
+            idle  = _idle.setdefault(key, [])
+            mail  = idle.pop() if idle else None
+            if mail is None:
+                if _count.get(key, 0) < _MAX_PER_ACCOUNT:
+                    _count[key] = _count.get(key, 0) + 1
+                    create = True
+                else:
+                    create = False
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise imaplib.IMAP4.abort("Timed out waiting for a free IMAP connection")
+                    _lock.wait(min(remaining, 5))
+        for old in stale:
+            _close(old)
+
+        if mail is not None:
+            if _healthy(mail):
+                return key, mail
+            _discard(key, mail)
+            continue
+        if create:
+            try:
+                return key, _open(email_addr, app_password)
+            except Exception:
+                with _lock:
+                    _count[key] -= 1
+                    _lock.notify()
+                raise
+
+
+def _release(key, mail) -> None:
+    mail.pool_last_used = time.monotonic()
+    with _lock:
+        _idle.setdefault(key, []).append(mail)
+        _lock.notify()
+
+
+def _discard(key, mail) -> None:
+    with _lock:
+        _count[key] = max(0, _count.get(key, 1) - 1)
+        _lock.notify()
+    _close(mail)
+
+
+def select(mail, mailbox: str, readonly: bool = True) -> None:
+    """SELECT `mailbox` on a pooled connection unless it is already usable as asked."""
+    current = getattr(mail, "pool_selected", None)
+    if current and current[0] == mailbox and (readonly or not current[1]):
+        return
+    status, data = mail.select(mailbox, readonly=readonly)
+    if status != "OK":
+        mail.pool_selected = None
+        raise imaplib.IMAP4.error(f"SELECT {mailbox} failed: {data}")
+    _, found = mail.response("UIDVALIDITY")
+    try:
+        mail.pool_uidvalidity = int(found[-1])
+    except (TypeError, ValueError, IndexError):
+        mail.pool_uidvalidity = 0
+    mail.pool_selected = (mailbox, readonly)
+
+
+def uidvalidity(mail) -> int:
+    """UIDVALIDITY of the mailbox selected on a pooled connection (0 if unknown)."""
+    return getattr(mail, "pool_uidvalidity", 0) if getattr(mail, "pool_selected", None) else 0
+
+
+@contextmanager
+def connection(email_addr: str, app_password: str, mailbox: str | None = "inbox", readonly: bool = True):
+    """
+    Borrow a logged-in connection for this account, with `mailbox` selected
+    (None = leave the selection as it is). Connection-level failures discard
+    it; IMAP NO/BAD errors hand it back to the pool.
+    """
+    key, mail = _acquire(email_addr, app_password)
+    try:
+        if mailbox is not None:
+            select(mail, mailbox, readonly)
+        yield mail
+    except (imaplib.IMAP4.abort, OSError):
+        _discard(key, mail)
+        raise
+    except BaseException:
+        _release(key, mail)
+        raise
+    else:
+        _release(key, mail)
+
+
+@contextmanager
+def dedicated(email_addr: str, app_password: str):
+    """
+    A logged-in connection outside the pool, for long-lived use such as
+    IDLE that would otherwise pin a pooled slot. Logged out on exit.
+    """
+    mail = _open(email_addr, app_password)
+    try:
+        yield mail
+    finally:
+        _close(mail)
+
+
+def account_token(email_addr: str, app_password: str) -> str:
+    """Opaque identity of address + app password (a hash, never the password)."""
+    return ":".join(_key(email_addr, app_password))
+
+
+def verify(email_addr: str, app_password: str) -> str:
+    """
+    Prove the credentials by logging in (or reusing a pooled login).
+    Returns account_token(); raises on failure.
+    """
+    with connection(email_addr, app_password, mailbox=None):
+        pass
+    return account_token(email_addr, app_password)
+
+
+def close_account(email_addr: str, app_password: str) -> None:
+    """Log out every idle connection for these credentials (the sidebar does this on reconnect)."""
+    key = _key(email_addr, app_password)
+    with _lock:
+        conns = _idle.pop(key, [])
+        _count[key] = max(0, _count.get(key, 0) - len(conns))
+    for mail in conns:
+        _close(mail)
@@ -0,0 +1,208 @@
+"""
+Background queue for slow Gmail operations (reply send, single delete).
+
+The inbox enqueues a job and updates its view straight away; worker threads
+do the SMTP/IMAP work, retry transient failures with backoff (a send only
+if it never reached the server) and record the outcome. The session that
+submitted a job picks the result up with collect() on a later rerun and
+turns it into a flash message.
+
+Job status (never credentials, bodies or attachments) is persisted so a
+restart can report work that was interrupted.
+
+Storage: .smartmail_jobs.json  (next to agent.py / working dir)
+"""
+from __future__ import annotations
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+import uuid
+
+from utils import store
+from utils.email_utils import SendNotAttempted, delete_emails, send_email
+
+_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".smartmail_jobs.json")
+
+_WORKERS      = 2
+_MAX_ATTEMPTS = 3
+_BACKOFF      = (2.0, 8.0)   # seconds before the 2nd and 3rd attempt
+_KEEP         = 200          # finished jobs kept in the status file
+
+_lock     = threading.Lock()
+_jobs:     dict[str, dict] | None = None   # job id → status record (persisted)
+_payloads: dict[str, dict] = {}            # job id → arguments (memory only)
+_queue:    "queue.Queue[str]" = queue.Queue()
+_workers:  list[threading.Thread] = []
+
+
+class _NotDeleted(Exception):
+    """The server answered but didn't expunge the UID — retrying gets the same answer."""
+
+
+# ── Persistence ────────────────────────────────────────────────────────────────
+
+def _load() -> dict[str, dict]:
+    global _jobs
+    if _jobs is None:
+        try:
+            with open(_STORE_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            _jobs = {j["id"]: j for j in data if isinstance(j, dict) and "id" in j}
+        except (FileNotFoundError, json.JSONDecodeError, TypeError, KeyError):
+            _jobs = {}
+        # Payloads lived in the old process's memory — those jobs can't resume
+        for job in _jobs.values():
+            if job["status"] in ("queued", "running"):
+                job.update(status="failed", finished_at=time.time(),
+                           error="Interrupted — SmartMail restarted before it finished.")
+    return _jobs
+
+
+def _save() -> None:
+    """Persist job status (caller holds _lock); oldest finished jobs are trimmed."""
+    jobs = sorted(_jobs.values(), key=lambda j: j["created_at"])
+    finished = [j for j in jobs if j["status"] in ("done", "failed")]
+    for job in finished[:max(0, len(finished) - _KEEP)]:
+        del _jobs[job["id"]]
+    try:
+        tmp = _STORE_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(list(_jobs.values()), f)
+        os.replace(tmp, _STORE_PATH)
+    except OSError:
+        pass  # read-only filesystem — status is tracked for this process only
+
+
+def _update(job_id: str, **fields) -> None:
+    with _lock:
+        _load()[job_id].update(fields)
+        _save()
+
+
+# ── Work ───────────────────────────────────────────────────────────────────────
+
+def _run_send(p: dict) -> None:
+    send_email(p["account"], p["app_password"], p["to_addr"], p["subject"], p["body"],
+               attachments=p.get("attachments"))
+
+
+def _run_delete(p: dict) -> None:
+    deleted = delete_emails(p["account"], p["app_password"], [p["uid"]]).get(int(p["uid"]))
+    # Gone either way as far as the store knows; the next sync restores it if it still exists
+    store.delete_messages(p["account"], "inbox", [p["uid"]])
+    if not deleted:
+        raise _NotDeleted("Message could not be deleted — it may already be gone from Gmail.")
+
+
+_RUNNERS = {"send": _run_send, "delete": _run_delete}
+
+
+def _retryable(kind: str, exc: Exception) -> bool:
+    """
+    A send is retried only when it certainly did not go out (connect/login
+    failed) — a failure after DATA may already have delivered it. Deletes
+    are idempotent and retried unless the error is permanent or the server
+    already answered for the UID.
+    """
+    if kind == "send":
+        return isinstance(exc, SendNotAttempted)
+    return not isinstance(exc, _NotDeleted) and not _permanent(exc)
+
+
+def _permanent(exc: Exception) -> bool:
+    """Errors a retry cannot fix: bad credentials, rejected recipients, oversized mail."""
+    if isinstance(exc, (ValueError, smtplib.SMTPAuthenticationError, smtplib.SMTPRecipientsRefused)):
+        return True
+    msg = str(exc).lower()
+    return "auth" in msg or "password" in msg or "too large" in msg
+
+
+def _run(job_id: str) -> None:
+    with _lock:
+        job = _load().get(job_id)
+        payload = _payloads.get(job_id)
+    if job is None or payload is None:
+        return
+    attempt = job["attempts"] + 1
+    _update(job_id, status="running", attempts=attempt)
+    try:
+        _RUNNERS[job["kind"]](payload)
+    except Exception as e:
+        if attempt < _MAX_ATTEMPTS and _retryable(job["kind"], e):
+            _update(job_id, status="queued", error=str(e)[:300])
+            delay = _BACKOFF[min(attempt, len(_BACKOFF)) - 1]
+            timer = threading.Timer(delay, _queue.put, (job_id,))
+            timer.daemon = True
+            timer.start()
+            return
+        _update(job_id, status="failed", error=str(e)[:300], finished_at=time.time())
+    else:
+        _update(job_id, status="done", error="", finished_at=time.time())
+    with _lock:
+        _payloads.pop(job_id, None)
+
+
+def _work_forever() -> None:
+    while True:
+        job_id = _queue.get()
+        try:
+            _run(job_id)
+        except Exception:
+            pass  # never let one job take the worker down
+
+
+def _start_workers() -> None:
+    """Start the worker threads on first use (caller holds _lock)."""
+    _workers[:] = [t for t in _workers if t.is_alive()]
+    for n in range(len(_workers), _WORKERS):
+        t = threading.Thread(target=_work_forever, name=f"smartmail-jobs-{n}", daemon=True)
+        t.start()
+        _workers.append(t)
+
+
+# ── Public API ─────────────────────────────────────────────────────────────────
+
+def submit(kind: str, account: str, app_password: str, label: str, ref: str = "", **payload) -> str:
+    """
+    Queue a "send" or "delete" job and return its id straight away. `label`
+    is shown in flash messages; `ref` is an opaque caller reference (the
+    inbox passes the message key). Attachments must already be plain
+    {"data", "filename", "content_type"} dicts — upload widgets may be gone
+    by the time the job runs.
+    """
+    if kind not in _RUNNERS:
+        raise ValueError(f"Unknown job kind: {kind!r}")
+    job_id = uuid.uuid4().hex[:12]
+    with _lock:
+        _load()[job_id] = {
+            "id": job_id, "kind": kind, "account": account, "label": label, "ref": ref,
+            "status": "queued", "attempts": 0, "error": "",
+            "created_at": time.time(), "finished_at": None,
+        }
+        _payloads[job_id] = dict(payload, account=account, app_password=app_password)
+        _save()
+        _start_workers()
+    _queue.put(job_id)
+    return job_id
+
+
+def collect(job_ids) -> tuple[list[dict], list[str]]:
+    """
+    Split `job_ids` into (finished job records, ids still queued/running).
+    Unknown ids are dropped.
+    """
+    finished, active = [], []
+    with _lock:
+        jobs = _load()
+        for job_id in job_ids:
+            job = jobs.get(job_id)
+            if job is None:
+                continue
+            if job["status"] in ("done", "failed"):
+                finished.append(dict(job))
+            else:
+                active.append(job_id)
+    return finished, active
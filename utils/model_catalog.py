@@ -0,0 +1,137 @@
+"""
+Process-wide Gemini model catalogue.
+
+genai.list_models() is a network round-trip; its filtered, preference-ordered
+result is cached per API key (by hash) for _TTL seconds and shared by every
+Streamlit session in the process, so Connect is instant after the first
+user. Model handles are shared the same way, per (key hash, model).
+
+Every key gets its own API clients, created with that key; nothing here
+calls genai.configure(), whose key is process-wide and would leak between
+sessions connected with different keys. A model the API reports as missing
+is dropped from the cached list straight away.
+"""
+from __future__ import annotations
+import threading
+import time
+
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+from google.generativeai.types import GenerateContentResponse
+
+from utils.model_scheduler import key_id
+
+_TTL = 6 * 3600
+
+_GEMINI_PREFERRED = [
+    "gemini-2.0-flash-lite",
+    "gemini-2.0-flash",
+    "gemini-1.5-flash",
+    "gemini-1.5-flash-latest",
+    "gemini-1.5-flash-8b",
+    "gemini-1.5-pro",
+    "gemini-pro",
+    "gemini-2.5-flash",
+]
+
+_EXCLUDED = ("tts", "vision", "embedding", "aqa", "preview")
+
+_lock      = threading.Lock()
+_catalogue: dict[str, tuple[float, list[str]]] = {}   # key_id → (fetched_at, ordered names)
+_handles:   dict[tuple[str, str], "_KeyedModel"] = {}   # (key_id, name) → handle
+_clients:   dict[str, tuple[glm.ModelServiceClient, glm.GenerativeServiceClient]] = {}   # key_id → clients
+
+
+class _KeyedModel:
+    """
+    generate_content() for one model through one key's client — the part
+    of genai.GenerativeModel the app uses, without the process-wide key.
+    """
+
+    def __init__(self, name: str, client: glm.GenerativeServiceClient):
+        self.model_name = f"models/{name}"
+        self._client    = client
+
+    def generate_content(self, prompt: str, generation_config: dict | None = None,
+                         stream: bool = False) -> GenerateContentResponse:
+        request = genai.protos.GenerateContentRequest(
+            model=self.model_name,
+            contents=[genai.protos.Content(role="user", parts=[genai.protos.Part(text=prompt)])],
+            generation_config=generation_config or {},
+        )
+        if stream:
+            return GenerateContentResponse.from_iterator(self._client.stream_generate_content(request))
+        return GenerateContentResponse.from_response(self._client.generate_content(request))
+
+
+def _clients_for(api_key: str) -> tuple[glm.ModelServiceClient, glm.GenerativeServiceClient]:
+    """This key's model-listing and generation clients, created once per process."""
+    kid = key_id(api_key)
+    with _lock:
+        if kid not in _clients:
+            options = {"api_key": api_key}
+            _clients[kid] = (glm.ModelServiceClient(client_options=options),
+                             glm.GenerativeServiceClient(client_options=options))
+        return _clients[kid]
+
+
+def _list_models(client: glm.ModelServiceClient) -> list[str]:
+    available = [
+        m.name.split("/")[-1]
+        for m in genai.list_models(client=client)
+        if "generateContent" in getattr(m, "supported_generation_methods", [])
+        and not any(x in m.name.lower() for x in _EXCLUDED)
+    ]
+    ordered  = [n for n in _GEMINI_PREFERRED if n in available]
+    ordered += [n for n in available if n not in ordered]
+    return ordered
+
+
+def models_for(api_key: str, refresh: bool = False) -> list[str]:
+    """
+    Usable models for this key in preference order. Served from the cache
+    when fresh, otherwise listed with this key's own client.
+    """
+    kid = key_id(api_key)
+    with _lock:
+        hit = _catalogue.get(kid)
+        if hit and not refresh and time.time() - hit[0] < _TTL and hit[1]:
+            return list(hit[1])
+    ordered = _list_models(_clients_for(api_key)[0])
+    with _lock:
+        _catalogue[kid] = (time.time(), ordered)
+    return list(ordered)
+
+
+def bind(api_key: str, names: list[str]) -> None:
+    """
+    Create this key's handles for `names`, all sharing the key's generation
+    client. Call at Connect.
+    """
+    kid    = key_id(api_key)
+    client = _clients_for(api_key)[1]
+    with _lock:
+        for name in names:
+            if (kid, name) not in _handles:
+                _handles[(kid, name)] = _KeyedModel(name, client)
+
+
+def handle(kid: str, name: str) -> "_KeyedModel | None":
+    """The handle bind() created for this key and model, or None."""
+    with _lock:
+        return _handles.get((kid, name))
+
+
+def forget(kid: str, name: str) -> None:
+    """A model disappeared (404 / not supported): drop it from the cache and its handle."""
+    with _lock:
+        hit = _catalogue.get(kid)
+        if hit and name in hit[1]:
+            _catalogue[kid] = (hit[0], [n for n in hit[1] if n != name])
+        _handles.pop((kid, name), None)
+
+
+def is_missing_model(msg: str) -> bool:
+    """True if an API error says the model no longer exists or can't generate content."""
+    low = msg.lower()
+    return "404" in msg or ("model" in low and ("not found" in low or "not supported" in low))
@@ -0,0 +1,215 @@
+"""
+Quota-aware Gemini model scheduler.
+
+Tracks, per API key and model, the requests made in the last minute, the
+requests and (estimated) tokens used today and any cooldown imposed by a
+429. pick() routes each call to the cheapest model that still has headroom,
+so an exhausted model is skipped without paying a failed round-trip first.
+
+Cooldowns and daily counters survive restarts until the quota resets
+(Gemini daily quotas reset at midnight Pacific time). API keys are only
+ever stored as a hash.
+
+Storage: .smartmail_models.json  (next to agent.py / working dir)
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+try:
+    from zoneinfo import ZoneInfo
+    _QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+except Exception:  # no tz database — treat the quota day as UTC
+    _QUOTA_TZ = None
+
+_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".smartmail_models.json")
+
+# Cheapest first — matched against the model name, most specific pattern first
+_COST_RANK = [
+    ("flash-lite", 0),
+    ("flash-8b",   1),
+    ("flash",      2),
+    ("pro",        4),
+]
+_DEFAULT_COST = 3
+
+# Approximate free-tier limits: (requests/minute, requests/day, tokens/minute)
+_LIMITS = [
+    ("flash-lite", (30,  1500, 1_000_000)),
+    ("2.5-pro",    (5,   100,   250_000)),
+    ("2.5-flash",  (10,  250,   250_000)),
+    ("flash-8b",   (15,  1500, 1_000_000)),
+    ("flash",      (15,  1500, 1_000_000)),
+    ("pro",        (2,   50,     32_000)),
+]
+_DEFAULT_LIMITS = (10, 500, 250_000)
+
+_MINUTE_COOLDOWN = 20.0   # fallback when a per-minute 429 carries no retry delay
+
+_lock  = threading.Lock()
+_state: dict | None = None                     # key_id → model → persisted usage
+_recent: dict[tuple[str, str], deque] = {}      # (key_id, model) → (timestamp, tokens) in the last minute
+
+
+def key_id(api_key: str) -> str:
+    """Stable, non-reversible identifier for an API key."""
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+
+def _lookup(name: str, table: list, default):
+    for pattern, value in table:
+        if pattern in name:
+            return value
+    return default
+
+
+def _quota_day(now: float | None = None) -> str:
+    return datetime.fromtimestamp(now or time.time(), _QUOTA_TZ).strftime("%Y-%m-%d")
+
+
+def _next_reset(now: float) -> float:
+    """Epoch seconds of the next daily quota reset."""
+    local = datetime.fromtimestamp(now, _QUOTA_TZ)
+    midnight = (local + timedelta(days=1)).replace(hour=0, minute=0, second=5, microsecond=0)
+    return midnight.timestamp()
+
+
+def _load() -> dict:
+    global _state
+    if _state is None:
+        try:
+            with open(_STORE_PATH, "r", encoding="utf-8") as f:
+                _state = json.load(f)
+            if not isinstance(_state, dict):
+                _state = {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            _state = {}
+    return _state
+
+
+def _save() -> None:
+    try:
+        tmp = _STORE_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_state, f)
+        os.replace(tmp, _STORE_PATH)
+    except OSError:
+        pass  # read-only filesystem — usage is tracked for this process only
+
+
+def _usage(kid: str, model: str, now: float) -> dict:
+    """Persisted usage row for (key, model), rolled over at the quota day boundary."""
+    row = _load().setdefault(kid, {}).setdefault(model, {})
+    day = _quota_day(now)
+    if row.get("day") != day:
+        row.update(day=day, requests=0, tokens=0)
+    row.setdefault("cooldown_until", 0.0)
+    return row
+
+
+def _minute(kid: str, model: str, now: float) -> deque:
+    window = _recent.setdefault((kid, model), deque())
+    while window and window[0][0] <= now - 60:
+        window.popleft()
+    return window
+
+
+def _headroom(kid: str, model: str, tokens: int, now: float) -> bool:
+    rpm, rpd, tpm = _lookup(model, _LIMITS, _DEFAULT_LIMITS)
+    row    = _usage(kid, model, now)
+    window = _minute(kid, model, now)
+    return (
+        row["cooldown_until"] <= now
+        and row["requests"] < rpd
+        and len(window) < rpm
+        and sum(t for _, t in window) + tokens <= tpm
+    )
+
+
+def pick(kid: str, candidates: list[str], tokens: int = 0) -> str | None:
+    """
+    Cheapest model in `candidates` with headroom for a request of about
+    `tokens` tokens, or None if every one is cooling down or at its limit.
+    Ties keep the caller's order.
+    """
+    now = time.time()
+    with _lock:
+        ranked = sorted(candidates, key=lambda m: _lookup(m, _COST_RANK, _DEFAULT_COST))
+        for model in ranked:
+            if _headroom(kid, model, tokens, now):
+                return model
+    return None
+
+
+def record(kid: str, model: str, tokens: int) -> None:
+    """Count one request (and its estimated tokens) against a model's quota."""
+    now = time.time()
+    with _lock:
+        row = _usage(kid, model, now)
+        row["requests"] += 1
+        row["tokens"]   += tokens
+        _minute(kid, model, now).append((now, tokens))
+        _save()
+
+
+def cooldown(kid: str, model: str, error: str) -> float:
+    """
+    Park a model after a 429. Per-day quota errors last until the next daily
+    reset; anything else uses the server's retry delay. Returns the cooldown
+    end as epoch seconds.
+    """
+    now = time.time()
+    if re.search(r"per.?day|daily", error, re.I):
+        until = _next_reset(now)
+    else:
+        m = re.search(r"retry in ([\d.]+)\s*s", error) or re.search(r"seconds:\s*(\d+)", error)
+        try:
+            until = now + (float(m.group(1)) if m else _MINUTE_COOLDOWN)
+        except ValueError:
+            until = now + _MINUTE_COOLDOWN
+    with _lock:
+        row = _usage(kid, model, now)
+        row["cooldown_until"] = max(row["cooldown_until"], until)
+        _save()
+    return until
+
+
+def wait_time(kid: str, candidates: list[str]) -> float | None:
+    """
+    Seconds until the soonest candidate could take a request again, or None
+    when all of them are out for the day.
+    """
+    now = time.time()
+    best = None
+    with _lock:
+        for model in candidates:
+            rpm, rpd, _ = _lookup(model, _LIMITS, _DEFAULT_LIMITS)
+            row = _usage(kid, model, now)
+            if row["requests"] >= rpd or row["cooldown_until"] >= _next_reset(now) - 60:
+                continue
+            window = _minute(kid, model, now)
+            ready  = max(row["cooldown_until"], window[0][0] + 60 if len(window) >= rpm else now)
+            best   = ready if best is None else min(best, ready)
+    return None if best is None else max(0.0, best - now)
+
+
+def status(kid: str, candidates: list[str]) -> list[dict]:
+    """Per-model usage for display: {"model", "requests", "limit", "cooling_down"}."""
+    now = time.time()
+    with _lock:
+        out = []
+        for model in candidates:
+            row = _usage(kid, model, now)
+            out.append({
+                "model":        model,
+                "requests":     row["requests"],
+                "limit":        _lookup(model, _LIMITS, _DEFAULT_LIMITS)[1],
+                "cooling_down": row["cooldown_until"] > now,
+            })
+    return out
@@ -0,0 +1,86 @@
+"""
+Process pool for CPU-bound MIME parsing.
+
+email.message_from_bytes, _parse_message and the HTML-to-text pass are pure
+Python and hold the GIL, so parsing a large fetch in the script thread
+stalls the UI and can't use more than one core. Fetch code hands each
+FETCH response (raw bytes) to submit() as soon as it arrives and keeps
+downloading while worker processes turn it into inbox records. That
+overlap pays even on one core, where the worker parses while the fetching
+thread waits on the network.
+
+Workers are started with "spawn": the app process runs daemon threads
+(IMAP pool reaper, watcher, job queue) and forking with their locks held
+is unsafe. If a pool can't be started the work runs inline in gather().
+
+Throughput by worker count: `python -m bench.parse_pool`.
+"""
+from __future__ import annotations
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+# A fetch that is a single FETCH response has nothing to overlap its parse
+# with, so only the pickling cost would remain; with the default batch of
+# 50 the 100 and 200 "Unread to fetch" choices are pooled
+MIN_JOBS = 2
+
+_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+
+_lock = threading.Lock()
+_pool: ProcessPoolExecutor | None = None
+_broken = False
+
+
+def _executor() -> ProcessPoolExecutor | None:
+    global _pool, _broken
+    with _lock:
+        if _pool is None and not _broken:
+            try:
+                _pool = ProcessPoolExecutor(_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            except (OSError, ValueError, NotImplementedError):
+                _broken = True   # e.g. no /dev/shm or process limits — stay inline
+        return _pool
+
+
+def _discard() -> None:
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def submit(fn, *args) -> Future | None:
+    """
+    Run fn(*args) in a worker process; `fn` must be a module-level function
+    and its arguments picklable. Returns None without running anything if
+    there is no pool — gather() then runs the job inline.
+    """
+    pool = _executor()
+    if pool is not None:
+        try:
+            return pool.submit(fn, *args)
+        except Exception:
+            _discard()
+    return None
+
+
+def gather(jobs) -> list:
+    """
+    Concatenate the list results of (future, fn, args) jobs in order. A job
+    without a future runs inline now; one whose worker died
+    (BrokenProcessPool) is redone inline.
+    """
+    out = []
+    for fut, fn, args in jobs:
+        if fut is None:
+            out.extend(fn(*args))
+            continue
+        try:
+            out.extend(fut.result())
+        except Exception:
+            _discard()
+            out.extend(fn(*args))
+    return out
@@ -2,7 +2,9 @@
 Persistent read-state store.
 
 Saves read email IDs to a local JSON file so the "read" badge
-survives page reloads and new browser sessions.
+survives page reloads and new browser sessions. An email's ID is its
+Message-ID, or its "<UIDVALIDITY>:<UID>" key when it has none — never the
+IMAP sequence number, which shifts whenever mail is expunged.
 
 Storage: .smartmail_read.json  (next to agent.py / working dir)
 """
@@ -18,7 +20,9 @@ def _load() -> set[str]:
         with open(_STORE_PATH, "r", encoding="utf-8") as f:
             data = json.load(f)
         if isinstance(data, list):
-            return set(data)
+            # Bare numbers are sequence numbers from older versions — they no
+            # longer point at the same message, so drop them
+            return {str(i) for i in data if not str(i).isdigit()}
     except (FileNotFoundError, json.JSONDecodeError):
         pass
     return set()
@@ -38,6 +42,11 @@ def _normalise(email_id) -> str:
     return str(email_id)
 
 
+def identity(em: dict) -> str:
+    """Read-state ID for an email record: Message-ID first, else its UIDVALIDITY:UID key."""
+    return (em.get("message_id") or "").strip() or _normalise(em.get("id", ""))
+
+
 def is_read(email_id) -> bool:
     """Return True if this email ID has been marked read in any previous session."""
     return _normalise(email_id) in _load()
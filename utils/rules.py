@@ -0,0 +1,116 @@
+"""
+Local rule-based pre-classifier.
+
+Bulk mail, noreply senders, auto-generated notices and calendar traffic can
+be categorised from headers and the sender address alone. preclassify()
+returns a category with a confidence score; anything at or above
+MIN_CONFIDENCE skips the Gemini call entirely. Process-wide counters record
+how often that happens so the saved quota can be measured.
+"""
+from __future__ import annotations
+import re
+import threading
+from email.utils import parseaddr
+
+# Rules below this confidence are treated as "ambiguous" and go to the model
+MIN_CONFIDENCE = 0.8
+
+_NOREPLY_LOCAL   = re.compile(r"^(no[-_.]?reply|do[-_.]?not[-_.]?reply|donotreply|mailer-daemon|postmaster|bounces?)\b", re.I)
+_NOTIFY_LOCAL    = re.compile(r"^(notifications?|notify|alerts?|updates?|account|security|billing|receipts?|orders?|shipping)\b", re.I)
+_MARKETING_LOCAL = re.compile(r"^(news(letter)?|marketing|promo(tions?)?|offers?|deals?|sales?|shop|store|hello|team)\b", re.I)
+_CALENDAR_FROM   = re.compile(r"^calendar-notification@|@calendar\.", re.I)
+_CALENDAR_SUBJ   = re.compile(r"^(invitation|updated invitation|canceled event|cancelled event|accepted|declined|tentatively accepted)( with note)?:", re.I)
+_PROMO_SUBJ      = re.compile(r"\d+\s?% off|\bsale\b|\bdeals?\b|\boffer\b|\bdiscount|\bcoupon|\bfree shipping|\blimited time|\bshop now|\bsave \$?\d", re.I)
+_UPDATE_SUBJ     = re.compile(r"\b(receipt|invoice|order|shipped|delivered|statement|password|verification|verify|security alert|sign[- ]in|payment)\b", re.I)
+
+_stats_lock = threading.Lock()
+_stats: dict = {"checked": 0, "skipped": 0, "rules": {}}
+
+
+def _is_calendar(em: dict) -> bool:
+    for att in em.get("attachments", []):
+        ct = (att.get("content_type") or "").lower()
+        if ct in ("text/calendar", "application/ics") or (att.get("filename") or "").lower().endswith(".ics"):
+            return True
+    return False
+
+
+def preclassify(em: dict) -> tuple[str, float, str] | None:
+    """
+    Categorise an email from its headers/sender only.
+    Returns (category, confidence, rule_name), or None when no rule applies.
+    """
+    headers = {k.lower(): v for k, v in (em.get("headers") or {}).items()}
+    _, addr  = parseaddr(em.get("from", ""))
+    local    = addr.split("@")[0] if "@" in addr else addr
+    subject  = em.get("subject", "") or ""
+
+    precedence = headers.get("precedence", "").lower()
+    auto_sub   = headers.get("auto-submitted", "").lower()
+    is_bulk    = bool(headers.get("list-unsubscribe") or headers.get("list-id")) or precedence in ("bulk", "list", "junk")
+
+    if _CALENDAR_FROM.search(addr) or _is_calendar(em):
+        return "Updates", 0.95, "calendar"
+    if _CALENDAR_SUBJ.match(subject) and (_NOREPLY_LOCAL.match(local) or auto_sub):
+        return "Updates", 0.9, "calendar"
+    if auto_sub and auto_sub != "no":
+        return "Updates", 0.9, "auto-submitted"
+    if is_bulk and _PROMO_SUBJ.search(subject):
+        return "Promotions", 0.92, "bulk-promo"
+    if is_bulk and _MARKETING_LOCAL.match(local):
+        return "Promotions", 0.88, "bulk-marketing-sender"
+    if _NOREPLY_LOCAL.match(local) or _NOTIFY_LOCAL.match(local):
+        if _PROMO_SUBJ.search(subject):
+            return "Promotions", 0.85, "noreply-promo"
+        if _UPDATE_SUBJ.search(subject) or _NOTIFY_LOCAL.match(local):
+            return "Updates", 0.88, "noreply-notification"
+        return "Updates", 0.8, "noreply"
+    if is_bulk:
+        return "Promotions", 0.7, "bulk"
+    return None
+
+
+def local_summary(body: str, max_chars: int = 240) -> str:
+    """Extractive stand-in for the AI summary: the first sentence or two of the body."""
+    text = re.sub(r"\s+", " ", body or "").strip()
+    if not text:
+        return ""
+    sentences = re.split(r"(?<=[.!?])\s+", text)
+    out = ""
+    for sent in sentences[:2]:
+        if len(out) + len(sent) > max_chars:
+            break
+        out = f"{out} {sent}".strip()
+    return out or text[:max_chars].rstrip() + "…"
+
+
+def classify_locally(em: dict) -> dict | None:
+    """
+    Analysis result for `em` if a rule is confident enough, else None (send it
+    to the model). Updates the skip-rate counters either way.
+    """
+    hit = preclassify(em)
+    confident = hit is not None and hit[1] >= MIN_CONFIDENCE
+    with _stats_lock:
+        _stats["checked"] += 1
+        if confident:
+            _stats["skipped"] += 1
+            _stats["rules"][hit[2]] = _stats["rules"].get(hit[2], 0) + 1
+    if not confident:
+        return None
+    category, confidence, rule = hit
+    return {
+        "category":   category,
+        "summary":    local_summary(em.get("body", "")) or em.get("subject", ""),
+        "draft":      "",
+        "rule":       rule,
+        "confidence": confidence,
+    }
+
+
+def stats() -> dict:
+    """Emails checked, how many skipped the model, the skip rate and hits per rule."""
+    with _stats_lock:
+        out = {"checked": _stats["checked"], "skipped": _stats["skipped"], "rules": dict(_stats["rules"])}
+    out["skip_rate"] = out["skipped"] / out["checked"] if out["checked"] else 0.0
+    return out
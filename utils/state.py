@@ -13,7 +13,14 @@ def init_state():
         "drafts":           {},
         "sent_flags":       {},
         "reply_att_gen":    {},   # per-email counter — incremented on send to reset file uploader
-        "deleted_indices":  set(),   # soft-deleted email indices
+        "deleted_ids":      set(),   # soft-deleted message keys (em["id"])
+        "lazy_bodies":      False,   # headers + preview fetch — full bodies downloaded on open
+        "fetch_limit":      20,      # newest unread messages listed; above one fetch batch they download in parallel
+        "att_cache":        {},      # (uid, section) → bytes, only for attachments the user opened
+        "sync_state":       {},      # (account, mailbox) → UIDVALIDITY / UIDNEXT / HIGHESTMODSEQ
+        "store_account":    "",      # account whose stored inbox is loaded in this session
+        "store_generation": 0,       # last store generation seen — a newer one means a sync landed
+        "store_verified":   "",      # imap_pool.account_token() of credentials that logged in this session
 
         "current_page": "inbox",
 
@@ -24,6 +31,7 @@ def init_state():
         "compose_gen":   0,   # incremented on each AI generate to force widget refresh
         "gemini_model_name": "",
         "model_fallbacks":   [],
+        "gemini_key_id":     "",   # hash of the Gemini key — model_scheduler usage is tracked per key
 
         "inbox_sort":   "Newest First",
         "inbox_search": "",
@@ -36,6 +44,8 @@ def init_state():
         # Inbox: persist reply-sent and inbox-zero flash messages across rerun
         "inbox_reply_sent_msg": "",
         "inbox_flash_msg":      "",
+        "inbox_error_msg":      "",
+        "jobs":                 [],   # ids of background send/delete jobs this session is waiting on
         # Inbox: two-step bulk delete confirmation flag
         "bulk_delete_confirm":  False,
 
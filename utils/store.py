@@ -0,0 +1,344 @@
+"""
+Persistent local message store.
+
+Keeps every synced message — parsed headers, cleaned body, attachment
+descriptors and AI results — in a local SQLite file so a new browser tab
+can draw the inbox instantly instead of refetching from Gmail.
+
+Rows are keyed by (account, mailbox, uid). A per-mailbox `generation`
+counter is bumped whenever the message set changes so open sessions can
+tell that a background sync landed new data.
+
+Storage: .smartmail_store.sqlite3  (next to agent.py / working dir)
+"""
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import time
+from email.utils import parseaddr, parsedate_to_datetime
+
+from utils.email_utils import message_key
+
+_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".smartmail_store.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    account      TEXT    NOT NULL,
+    mailbox      TEXT    NOT NULL,
+    uid          INTEGER NOT NULL,
+    uidvalidity  INTEGER NOT NULL DEFAULT 0,
+    message_id   TEXT,
+    headers      TEXT,
+    sender       TEXT,
+    sender_name  TEXT,
+    subject      TEXT,
+    date         TEXT,
+    date_ts      REAL,
+    body         TEXT,
+    body_loaded  INTEGER NOT NULL DEFAULT 1,
+    attachments  TEXT,
+    n_attachments INTEGER NOT NULL DEFAULT 0,
+    category     TEXT,
+    summary      TEXT,
+    draft        TEXT,
+    label_source TEXT,
+    updated_at   REAL,
+    PRIMARY KEY (account, mailbox, uid)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_date     ON messages (account, mailbox, date_ts);
+CREATE INDEX IF NOT EXISTS idx_messages_sender   ON messages (account, mailbox, sender_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_messages_category ON messages (account, mailbox, category);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    account       TEXT    NOT NULL,
+    mailbox       TEXT    NOT NULL,
+    uidvalidity   INTEGER,
+    uidnext       INTEGER,
+    highest_uid   INTEGER,
+    highestmodseq INTEGER,
+    fetch_limit   INTEGER,          -- how many newest unread messages the set holds
+    generation    INTEGER NOT NULL DEFAULT 0,
+    synced_at     REAL,
+    PRIMARY KEY (account, mailbox)
+);
+"""
+
+# Inbox sort option → ORDER BY clause (see components/inbox.SORT_OPTIONS)
+SORT_SQL = {
+    "Newest First":    "date_ts DESC, uid DESC",
+    "Oldest First":    "date_ts ASC, uid ASC",
+    "Sender A→Z":      "sender_name COLLATE NOCASE ASC, uid DESC",
+    "Sender Z→A":      "sender_name COLLATE NOCASE DESC, uid DESC",
+    "Subject A→Z":     "subject COLLATE NOCASE ASC, uid DESC",
+    "Has Attachments": "n_attachments DESC, date_ts DESC",
+}
+
+# Columns added after the first release: table → {name → DDL type}
+_ADDED_COLUMNS = {
+    "messages":   {"headers": "TEXT", "label_source": "TEXT"},
+    "sync_state": {"fetch_limit": "INTEGER"},
+}
+
+_initialised = False
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialised
+    conn = sqlite3.connect(_STORE_PATH, timeout=10)
+    conn.row_factory = sqlite3.Row
+    if not _initialised:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        for table, columns in _ADDED_COLUMNS.items():
+            have = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+            for col, ddl in columns.items():
+                if col not in have:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {ddl}")
+        _initialised = True
+    return conn
+
+
+def _date_ts(value: str) -> float:
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except Exception:
+        return 0.0
+
+
+def _sender_name(value: str) -> str:
+    name, addr = parseaddr(value or "")
+    return (name or addr.split("@")[0] or value or "").strip()
+
+
+def _row_values(account: str, mailbox: str, uidvalidity: int, em: dict) -> tuple:
+    # Descriptors only — never persist downloaded attachment bytes
+    atts = [{k: v for k, v in a.items() if k != "data"} for a in em.get("attachments", [])]
+    return (
+        account, mailbox, int(em["uid"]), uidvalidity, em.get("message_id", ""), json.dumps(em.get("headers", {})),
+        em.get("from", ""), _sender_name(em.get("from", "")),
+        em.get("subject", ""), em.get("date", ""), _date_ts(em.get("date", "")),
+        em.get("body", ""), int(em.get("body_loaded", True)),
+        json.dumps(atts), len(atts), time.time(),
+    )
+
+
+def _row_email(row: sqlite3.Row) -> dict:
+    return {
+        "id":          message_key(row["uidvalidity"], row["uid"]),
+        "uid":         row["uid"],
+        "uidvalidity": row["uidvalidity"],
+        "message_id":  row["message_id"] or "",
+        "headers":     json.loads(row["headers"] or "{}"),
+        "from":        row["sender"] or "",
+        "subject":     row["subject"] or "",
+        "date":        row["date"] or "",
+        "body":        row["body"] or "",
+        "body_loaded": bool(row["body_loaded"]),
+        "attachments": [dict(a, data=None) for a in json.loads(row["attachments"] or "[]")],
+    }
+
+
+# ── Messages ───────────────────────────────────────────────────────────────────
+
+def replace_mailbox(account: str, mailbox: str, emails: list[dict], state: dict) -> int:
+    """
+    Make the stored set for (account, mailbox) match `emails` after a sync:
+    upsert every message (AI columns untouched), drop the rest, save the
+    sync state and bump the generation. Returns the new generation.
+    """
+    uidvalidity = int(state.get("uidvalidity") or 0)
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "DELETE FROM messages WHERE account=? AND mailbox=? AND uidvalidity != ?",
+                (account, mailbox, uidvalidity),
+            )
+            keep = [int(em["uid"]) for em in emails]
+            conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS keep_uids (uid INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM keep_uids")
+            conn.executemany("INSERT OR IGNORE INTO keep_uids VALUES (?)", [(u,) for u in keep])
+            conn.execute(
+                "DELETE FROM messages WHERE account=? AND mailbox=? AND uid NOT IN (SELECT uid FROM keep_uids)",
+                (account, mailbox),
+            )
+            conn.executemany(
+                """INSERT INTO messages (account, mailbox, uid, uidvalidity, message_id,
+                       headers, sender, sender_name, subject, date, date_ts, body, body_loaded,
+                       attachments, n_attachments, updated_at)
+                   VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                   ON CONFLICT (account, mailbox, uid) DO UPDATE SET
+                       message_id=excluded.message_id, headers=excluded.headers,
+                       sender=excluded.sender, sender_name=excluded.sender_name,
+                       subject=excluded.subject, date=excluded.date, date_ts=excluded.date_ts,
+                       body=CASE WHEN excluded.body_loaded >= messages.body_loaded
+                                 THEN excluded.body ELSE messages.body END,
+                       body_loaded=MAX(excluded.body_loaded, messages.body_loaded),
+                       attachments=excluded.attachments, n_attachments=excluded.n_attachments,
+                       updated_at=excluded.updated_at""",
+                [_row_values(account, mailbox, uidvalidity, em) for em in emails],
+            )
+            conn.execute(
+                """INSERT INTO sync_state (account, mailbox, uidvalidity, uidnext, highest_uid,
+                       highestmodseq, fetch_limit, generation, synced_at)
+                   VALUES (?,?,?,?,?,?,?,1,?)
+                   ON CONFLICT (account, mailbox) DO UPDATE SET
+                       uidvalidity=excluded.uidvalidity, uidnext=excluded.uidnext,
+                       highest_uid=excluded.highest_uid, highestmodseq=excluded.highestmodseq,
+                       fetch_limit=excluded.fetch_limit,
+                       generation=sync_state.generation + 1, synced_at=excluded.synced_at""",
+                (account, mailbox, uidvalidity, state.get("uidnext"), state.get("highest_uid"),
+                 state.get("highestmodseq"), state.get("limit"), time.time()),
+            )
+            row = conn.execute(
+                "SELECT generation FROM sync_state WHERE account=? AND mailbox=?",
+                (account, mailbox),
+            ).fetchone()
+            return row["generation"] if row else 0
+    except sqlite3.Error:
+        return 0  # read-only filesystem — the session copy still works
+
+
+def save_body(account: str, mailbox: str, uid: int, body: str, attachments: list[dict]) -> None:
+    """Persist a body downloaded on demand (headers-first mode)."""
+    atts = [{k: v for k, v in a.items() if k != "data"} for a in attachments]
+    try:
+        with _connect() as conn:
+            conn.execute(
+                """UPDATE messages SET body=?, body_loaded=1, attachments=?, n_attachments=?, updated_at=?
+                   WHERE account=? AND mailbox=? AND uid=?""",
+                (body, json.dumps(atts), len(atts), time.time(), account, mailbox, int(uid)),
+            )
+    except sqlite3.Error:
+        pass
+
+
+def save_analysis(account: str, mailbox: str, uid: int, category: str | None = None,
+                  summary: str | None = None, draft: str | None = None,
+                  source: str | None = None) -> None:
+    """
+    Store AI results for one message; None leaves a column as it was.
+    `source` records who chose the category: "ai", "rules", "model" or "user".
+    """
+    try:
+        with _connect() as conn:
+            conn.execute(
+                """UPDATE messages SET category=COALESCE(?, category), summary=COALESCE(?, summary),
+                       draft=COALESCE(?, draft), label_source=COALESCE(?, label_source), updated_at=?
+                   WHERE account=? AND mailbox=? AND uid=?""",
+                (category, summary, draft, source, time.time(), account, mailbox, int(uid)),
+            )
+    except sqlite3.Error:
+        pass
+
+
+def delete_messages(account: str, mailbox: str, uids) -> None:
+    try:
+        with _connect() as conn:
+            conn.executemany(
+                "DELETE FROM messages WHERE account=? AND mailbox=? AND uid=?",
+                [(account, mailbox, int(u)) for u in uids],
+            )
+    except sqlite3.Error:
+        pass
+
+
+def load_mailbox(account: str, mailbox: str = "inbox", sort: str = "Oldest First") -> tuple[list[dict], list[dict]]:
+    """
+    Return (emails, analyses) for a mailbox — two parallel lists, the second
+    holding {"category", "summary", "draft"} (values may be None if not analysed).
+    """
+    order = SORT_SQL.get(sort, SORT_SQL["Oldest First"])
+    try:
+        with _connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM messages WHERE account=? AND mailbox=? ORDER BY {order}",
+                (account, mailbox),
+            ).fetchall()
+    except sqlite3.Error:
+        return [], []
+    emails   = [_row_email(r) for r in rows]
+    analyses = [{"category": r["category"], "summary": r["summary"], "draft": r["draft"]} for r in rows]
+    return emails, analyses
+
+
+def labelled_messages(sources=("ai", "user")) -> list[dict]:
+    """
+    Every stored message whose category came from one of `sources`, oldest
+    first, as {"from", "subject", "body", "category", "source"} — the training
+    and evaluation data for utils/classifier.py.
+    """
+    marks = ",".join("?" * len(sources))
+    try:
+        with _connect() as conn:
+            rows = conn.execute(
+                f"""SELECT sender, subject, body, category, label_source FROM messages
+                    WHERE category IS NOT NULL AND body_loaded=1 AND label_source IN ({marks})
+                    ORDER BY date_ts ASC, uid ASC""",
+                tuple(sources),
+            ).fetchall()
+    except sqlite3.Error:
+        return []
+    return [
+        {"from": r["sender"] or "", "subject": r["subject"] or "", "body": r["body"] or "",
+         "category": r["category"], "source": r["label_source"]}
+        for r in rows
+    ]
+
+
+def ordered_uids(account: str, mailbox: str, sort: str, category: str | None = None) -> list[int]:
+    """UIDs in display order for an inbox sort option, optionally for one category."""
+    order = SORT_SQL.get(sort)
+    if not order:
+        return []
+    sql    = "SELECT uid FROM messages WHERE account=? AND mailbox=?"
+    params: list = [account, mailbox]
+    if category:
+        sql += " AND COALESCE(category, 'Others')=?"
+        params.append(category)
+    try:
+        with _connect() as conn:
+            return [r["uid"] for r in conn.execute(f"{sql} ORDER BY {order}", params)]
+    except sqlite3.Error:
+        return []
+
+
+def category_counts(account: str, mailbox: str = "inbox") -> dict[str, int]:
+    try:
+        with _connect() as conn:
+            rows = conn.execute(
+                """SELECT COALESCE(category, 'Others') AS cat, COUNT(*) AS n FROM messages
+                   WHERE account=? AND mailbox=? GROUP BY cat""",
+                (account, mailbox),
+            ).fetchall()
+    except sqlite3.Error:
+        return {}
+    return {r["cat"]: r["n"] for r in rows}
+
+
+# ── Sync state ─────────────────────────────────────────────────────────────────
+
+def load_sync_state(account: str, mailbox: str = "inbox") -> tuple[dict | None, int]:
+    """Return (sync state dict or None, generation)."""
+    try:
+        with _connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM sync_state WHERE account=? AND mailbox=?", (account, mailbox),
+            ).fetchone()
+    except sqlite3.Error:
+        return None, 0
+    if not row:
+        return None, 0
+    state = {
+        "uidvalidity":   row["uidvalidity"],
+        "uidnext":       row["uidnext"],
+        "highest_uid":   row["highest_uid"],
+        "highestmodseq": row["highestmodseq"],
+        "limit":         row["fetch_limit"],
+    }
+    return state, row["generation"]
+
+
+def generation(account: str, mailbox: str = "inbox") -> int:
+    return load_sync_state(account, mailbox)[1]
@@ -0,0 +1,153 @@
+"""
+Incremental inbox sync.
+
+Remembers UIDVALIDITY, the highest UID seen and HIGHESTMODSEQ per mailbox so
+a refresh only downloads messages that are new since the last sync. Messages
+already held keep their dicts (and therefore their AI results) untouched.
+
+Sync state is a plain dict — callers keep one per (account, mailbox):
+    {"uidvalidity": int, "uidnext": int, "highest_uid": int, "highestmodseq": int | None,
+     "limit": int}
+"""
+from __future__ import annotations
+import imaplib
+import re
+
+from utils import imap_pool, store
+from utils.email_utils import (
+    fetch_uids, fetch_uids_parallel, search_unseen, _split_fetch_response, _uid_set, _FETCH_BATCH_SIZE,
+)
+
+_STATUS_ITEM = re.compile(rb"(UIDVALIDITY|UIDNEXT|HIGHESTMODSEQ) (\d+)")
+_FLAGS       = re.compile(rb"FLAGS \(([^)]*)\)")
+
+
+def _mailbox_status(mail, mailbox: str, condstore: bool) -> dict:
+    """One STATUS round-trip — no SELECT needed to tell whether anything changed."""
+    items = "(UIDVALIDITY UIDNEXT HIGHESTMODSEQ)" if condstore else "(UIDVALIDITY UIDNEXT)"
+    status, data = mail.status(mailbox, items)
+    if status != "OK" or not data or not data[0]:
+        raise imaplib.IMAP4.error(f"STATUS failed for {mailbox}")
+    found = {k.decode().lower(): int(v) for k, v in _STATUS_ITEM.findall(data[0])}
+    return {
+        "uidvalidity":   found.get("uidvalidity", 0),
+        "uidnext":       found.get("uidnext", 0),
+        "highestmodseq": found.get("highestmodseq"),
+    }
+
+
+def _changed_since(mail, uids, modseq: int) -> dict[int, list[str]]:
+    """CONDSTORE: flags of the given UIDs whose MODSEQ moved past `modseq`."""
+    if not uids:
+        return {}
+    try:
+        status, data = mail.uid("FETCH", _uid_set(uids), f"(UID FLAGS) (CHANGEDSINCE {int(modseq)})")
+    except imaplib.IMAP4.abort:
+        raise
+    except Exception:
+        return {}
+    if status != "OK":
+        return {}
+    changed = {}
+    for rec in _split_fetch_response(data):
+        if rec["uid"] is None:
+            continue
+        flags = _FLAGS.search(rec["meta"])
+        changed[rec["uid"]] = flags.group(1).decode(errors="replace").split() if flags else []
+    return changed
+
+
+def sync_unseen(
+    email_addr: str,
+    app_password: str,
+    emails: list[dict],
+    state: dict | None,
+    limit: int = 20,
+    headers_only: bool = False,
+    mailbox: str = "inbox",
+) -> dict:
+    """
+    Bring `emails` (the last synced unread list) up to date with the server.
+
+    Returns {"emails", "state", "new", "removed", "changed", "full"} where
+    new/removed/changed are UID lists and full=True means the cached list was
+    discarded (first sync, or UIDVALIDITY changed and old UIDs are meaningless).
+    """
+    # STATUS comes first and needs no selection — the pool SELECTs only if there is work
+    with imap_pool.connection(email_addr, app_password, mailbox=None) as mail:
+        condstore = "CONDSTORE" in mail.capabilities
+        status    = _mailbox_status(mail, mailbox, condstore)
+
+        full = not state or state.get("uidvalidity") != status["uidvalidity"]
+        if full:
+            emails = []
+        elif (condstore
+              and limit == state.get("limit")
+              and status["uidnext"] == state.get("uidnext")
+              and status["highestmodseq"] is not None
+              and status["highestmodseq"] == state.get("highestmodseq")):
+            # Nothing arrived, no flag moved, same limit — skip SELECT/SEARCH entirely
+            return {"emails": emails, "state": dict(state), "new": [],
+                    "removed": [], "changed": [], "full": False}
+
+        imap_pool.select(mail, mailbox, readonly=True)
+        target = set(search_unseen(mail, limit))
+        known  = {em["uid"] for em in emails if em.get("uid") is not None}
+
+        new_uids = sorted(target - known)
+        removed  = sorted(known - target)
+
+        changed = {}
+        if condstore and not full and state.get("highestmodseq"):
+            changed = _changed_since(mail, sorted(known & target), state["highestmodseq"])
+
+        if len(new_uids) > _FETCH_BATCH_SIZE:
+            # A first sync or a big backlog — spread the batches over parallel connections
+            fetched = fetch_uids_parallel(email_addr, app_password, new_uids, headers_only=headers_only,
+                                          mailbox=mailbox, uidvalidity=status["uidvalidity"])
+        else:
+            fetched = fetch_uids(mail, new_uids, headers_only=headers_only,
+                                 uidvalidity=status["uidvalidity"])
+        kept    = [em for em in emails if em.get("uid") in target]
+        for em in kept:
+            if em["uid"] in changed:
+                em["flags"] = changed[em["uid"]]
+
+        merged = sorted(kept + fetched, key=lambda em: em["uid"])
+        prev_highest = (state or {}).get("highest_uid", 0) if not full else 0
+        new_state = {
+            "uidvalidity":   status["uidvalidity"],
+            "uidnext":       status["uidnext"],
+            "highest_uid":   max([prev_highest] + [em["uid"] for em in merged]),
+            "highestmodseq": status["highestmodseq"],
+            "limit":         limit,
+        }
+        return {
+            "emails":  merged,
+            "state":   new_state,
+            "new":     [em["uid"] for em in fetched],
+            "removed": removed,
+            "changed": sorted(changed),
+            "full":    full,
+        }
+
+
+# ── Store reconcile ────────────────────────────────────────────────────────────
+
+def reconcile(email_addr: str, app_password: str, mailbox: str = "inbox",
+              headers_only: bool = False, limit: int = 20) -> dict | None:
+    """
+    Sync the stored copy of a mailbox with IMAP on the calling thread.
+    Returns the sync_unseen() result, or None if the server couldn't be reached.
+    """
+    try:
+        emails, _ = store.load_mailbox(email_addr, mailbox)
+        state, _  = store.load_sync_state(email_addr, mailbox)
+        res = sync_unseen(email_addr, app_password, emails, state, limit=limit,
+                          headers_only=headers_only, mailbox=mailbox)
+        if (res["full"] or res["new"] or res["removed"] or res["changed"]
+                or res["state"]["limit"] != (state or {}).get("limit")):
+            store.replace_mailbox(email_addr, mailbox, res["emails"], res["state"])
+        return res
+    except Exception:
+        return None  # offline / bad credentials — the stored copy stays as it was
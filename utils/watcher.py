@@ -0,0 +1,218 @@
+"""
+Push updates for connected accounts via IMAP IDLE.
+
+One daemon thread per (account, mailbox) keeps a dedicated connection in
+IDLE. When the server reports EXISTS / EXPUNGE / FETCH (new mail, removed
+mail, flags changed elsewhere) the thread runs an incremental sync into
+the local store; open inbox sessions notice the new store generation and
+analyse only the messages that arrived.
+
+Servers without IDLE are polled instead. sync's STATUS check makes a quiet
+poll one round-trip; the interval doubles while nothing changes and after
+errors, and drops back to the minimum once something does.
+
+A watcher remembers which Streamlit sessions asked for it and stops (closing
+its connection and dropping the password) once none of them is live, or
+when the sidebar reconnects with other credentials.
+"""
+from __future__ import annotations
+import hashlib
+import imaplib
+import re
+import select
+import threading
+import time
+
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils import imap_pool
+from utils.sync import reconcile
+
+_RENEW       = 9 * 60   # re-issue IDLE well inside the 29-minute RFC 2177 limit (and NAT timeouts)
+_TICK        = 5        # how often a waiting thread checks whether it should stop or resync
+_POLL_MIN    = 30       # polling fallback: first interval (seconds)
+_POLL_MAX    = 10 * 60  # polling fallback / reconnect backoff ceiling
+_RETRY_MIN   = 5        # first reconnect delay after a connection error
+
+_CHANGE = re.compile(rb"^\* \d+ (EXISTS|EXPUNGE|FETCH)\b", re.I)
+
+_lock     = threading.Lock()
+_watchers: dict[tuple[str, str], "_Watcher"] = {}
+
+
+class _Watcher:
+    def __init__(self, email_addr: str, app_password: str, mailbox: str, headers_only: bool, limit: int):
+        self.email_addr   = email_addr
+        self.app_password = app_password
+        self.mailbox      = mailbox
+        self.headers_only = headers_only
+        self.limit        = limit
+        self.secret       = hashlib.sha256(app_password.encode()).hexdigest()
+        self.stop         = threading.Event()
+        self.resync       = threading.Event()   # settings changed — sync now, don't wait for the server
+        self.sessions     = set()                # Streamlit session ids using this watcher
+        self.mode         = "starting"   # "idle" | "poll" | "offline"
+        self.thread       = threading.Thread(
+            target=self._run, name=f"smartmail-watch-{mailbox}", daemon=True)
+
+    def halt(self) -> None:
+        self.stop.set()
+        self.resync.set()   # wake a polling thread now rather than after its interval
+
+    def _interrupted(self) -> bool:
+        """A stop or resync was requested; stops the watcher once no session is using it."""
+        if not self.stop.is_set():
+            with _lock:
+                self.sessions = {s for s in self.sessions if _session_alive(s)}
+                orphaned = not self.sessions
+            if orphaned:
+                self.halt()
+        return self.stop.is_set() or self.resync.is_set()
+
+    def _wait(self, timeout: float) -> bool:
+        """Sleep up to `timeout` or until a resync is requested; True if the watcher was stopped."""
+        deadline = time.monotonic() + timeout
+        while not self._interrupted() and time.monotonic() < deadline:
+            self.resync.wait(min(_TICK, max(0.0, deadline - time.monotonic())))
+        self.resync.clear()
+        return self.stop.is_set()
+
+    def _sync(self) -> bool:
+        res = reconcile(self.email_addr, self.app_password, self.mailbox, self.headers_only, self.limit)
+        return bool(res and (res["full"] or res["new"] or res["removed"] or res["changed"]))
+
+    def _run(self) -> None:
+        try:
+            self._watch()
+        finally:
+            key = (self.email_addr.lower(), self.mailbox)
+            with _lock:
+                if _watchers.get(key) is self:
+                    del _watchers[key]
+
+    def _watch(self) -> None:
+        retry = _RETRY_MIN
+        while not self.stop.is_set():
+            try:
+                with imap_pool.dedicated(self.email_addr, self.app_password) as mail:
+                    if "IDLE" in mail.capabilities:
+                        imap_pool.select(mail, self.mailbox, readonly=True)
+                        retry = _RETRY_MIN
+                        self._idle_loop(mail)
+                        continue
+            except Exception:
+                self.mode = "offline"
+                if self._wait(retry):
+                    return
+                retry = min(retry * 2, _POLL_MAX)
+                continue
+            self.mode = "poll"
+            self._poll()
+
+    def _idle_loop(self, mail) -> None:
+        # Raw, unbuffered reads so select() sees every byte the server sent
+        mail.file = mail.sock.makefile("rb", buffering=0)
+        self.mode = "idle"
+        self._sync()            # catch up on anything that arrived while disconnected
+        while not self.stop.is_set():
+            changed = _idle(mail, _RENEW, self._interrupted)
+            if self.stop.is_set():
+                return
+            if changed or self.resync.is_set():
+                self.resync.clear()
+                self._sync()
+
+    def _poll(self) -> None:
+        self._sync()
+        interval = _POLL_MIN
+        while not self._wait(interval):
+            interval = _POLL_MIN if self._sync() else min(interval * 2, _POLL_MAX)
+
+
+def _idle(mail, renew: float, interrupted) -> bool:
+    """
+    One IDLE round on a SELECTed connection: wait up to `renew` seconds for
+    a mailbox change, or until interrupted() (checked every _TICK) returns
+    True, then DONE. True if the server reported a change.
+    """
+    # imaplib has no IDLE before Python 3.14 — speak it directly
+    tag = mail._new_tag()
+    mail.send(tag + b" IDLE\r\n")
+    line = mail.readline()
+    if not line.startswith(b"+"):
+        raise imaplib.IMAP4.error(f"IDLE refused: {line!r}")
+
+    changed  = False
+    deadline = time.monotonic() + renew
+    while not changed and not interrupted() and time.monotonic() < deadline:
+        if mail.sock.pending() or select.select([mail.sock], [], [], _TICK)[0]:
+            line = mail.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("Connection closed during IDLE")
+            changed = bool(_CHANGE.match(line))
+
+    mail.send(b"DONE\r\n")
+    while True:
+        line = mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("Connection closed during IDLE")
+        if line.startswith(tag + b" "):
+            if not line[len(tag) + 1:].upper().startswith(b"OK"):
+                raise imaplib.IMAP4.error(f"IDLE failed: {line!r}")
+            return changed
+        changed = changed or bool(_CHANGE.match(line))
+
+
+def _session_id() -> str:
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else ""
+
+
+def _session_alive(session_id: str) -> bool:
+    # Outside `streamlit run` (scripts, benchmarks) there are no sessions to outlive
+    if not session_id or not runtime.exists():
+        return True
+    return runtime.get_instance().is_active_session(session_id)
+
+
+# ── Public API ─────────────────────────────────────────────────────────────────
+
+def watch(email_addr: str, app_password: str, mailbox: str = "inbox", headers_only: bool = False,
+          limit: int = 20) -> None:
+    """
+    Make sure a watcher is running for this account and mailbox. Calling it
+    again is cheap; new credentials replace the old watcher. The calling
+    session keeps the watcher alive until it ends.
+    """
+    key = (email_addr.lower(), mailbox)
+    sid = _session_id()
+    with _lock:
+        current = _watchers.get(key)
+        if current and current.thread.is_alive() and not current.stop.is_set():
+            if current.secret == hashlib.sha256(app_password.encode()).hexdigest():
+                current.headers_only = headers_only
+                current.sessions.add(sid)
+                if current.limit != limit:
+                    current.limit = limit
+                    current.resync.set()   # re-SEARCH with the new limit straight away
+                return
+            current.halt()
+        w = _watchers[key] = _Watcher(email_addr, app_password, mailbox, headers_only, limit)
+        w.sessions.add(sid)
+        w.thread.start()
+
+
+def stop(email_addr: str, mailbox: str = "inbox") -> None:
+    """Stop the watcher for an account (it exits within a few seconds)."""
+    with _lock:
+        w = _watchers.pop((email_addr.lower(), mailbox), None)
+    if w:
+        w.halt()
+
+
+def mode(email_addr: str, mailbox: str = "inbox") -> str:
+    """Watcher state: "idle", "poll", "offline", "starting", or "" when none runs."""
+    with _lock:
+        w = _watchers.get((email_addr.lower(), mailbox))
+    return w.mode if w and w.thread.is_alive() else ""